@@ -21,6 +21,16 @@ CREATE TABLE IF NOT EXISTS execution_logs (
     prompt_version INTEGER,
     worker_output TEXT,
     worker_latency_ms INTEGER,
+    refine_latency_ms INTEGER,
+    worker_roundtrip_ms INTEGER,
+    evaluator_roundtrip_ms INTEGER,
+    rule_validation_ms INTEGER,
+    total_latency_ms INTEGER,
+    input_tokens INTEGER,
+    output_tokens INTEGER,
+    worker_input_tokens INTEGER,
+    worker_output_tokens INTEGER,
+    llm_cost_usd FLOAT,
     evaluation_score FLOAT,
     evaluation_passed BOOLEAN,
     evaluation_detail JSONB,
@@ -39,6 +49,8 @@ CREATE TABLE IF NOT EXISTS optimization_reports (
     before_prompt_content TEXT NOT NULL,
     after_prompt_version INTEGER NOT NULL,
     after_prompt_content TEXT NOT NULL,
+    before_prompt_tokens INTEGER,
+    after_prompt_tokens INTEGER,
     failure_analysis JSONB,
     improvement_pct FLOAT,
     triggered_by VARCHAR(64) NOT NULL DEFAULT 'cronjob',
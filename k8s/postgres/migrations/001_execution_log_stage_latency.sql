@@ -0,0 +1,8 @@
+-- Per-stage latency breakdown for execution_logs.
+-- Fresh databases get these columns from init-db.sql; run this on existing ones:
+--   make migrate
+ALTER TABLE execution_logs ADD COLUMN IF NOT EXISTS refine_latency_ms INTEGER;
+ALTER TABLE execution_logs ADD COLUMN IF NOT EXISTS worker_roundtrip_ms INTEGER;
+ALTER TABLE execution_logs ADD COLUMN IF NOT EXISTS evaluator_roundtrip_ms INTEGER;
+ALTER TABLE execution_logs ADD COLUMN IF NOT EXISTS rule_validation_ms INTEGER;
+ALTER TABLE execution_logs ADD COLUMN IF NOT EXISTS total_latency_ms INTEGER;
@@ -0,0 +1,10 @@
+-- LLM token usage and cost for execution_logs, prompt sizes for optimization_reports.
+-- Fresh databases get these columns from init-db.sql; run this on existing ones:
+--   make migrate
+ALTER TABLE execution_logs ADD COLUMN IF NOT EXISTS input_tokens INTEGER;
+ALTER TABLE execution_logs ADD COLUMN IF NOT EXISTS output_tokens INTEGER;
+ALTER TABLE execution_logs ADD COLUMN IF NOT EXISTS worker_input_tokens INTEGER;
+ALTER TABLE execution_logs ADD COLUMN IF NOT EXISTS worker_output_tokens INTEGER;
+ALTER TABLE execution_logs ADD COLUMN IF NOT EXISTS llm_cost_usd FLOAT;
+ALTER TABLE optimization_reports ADD COLUMN IF NOT EXISTS before_prompt_tokens INTEGER;
+ALTER TABLE optimization_reports ADD COLUMN IF NOT EXISTS after_prompt_tokens INTEGER;
@@ -36,6 +36,11 @@ BAD_PROMPTS = [
     "You are a simple bot. When asked anything, just say hello world and nothing else. Never produce functions or classes.",
 ]
 
+# Channel the worker prompt cache and manager prompt-version cache LISTEN on
+# (PROMPT_NOTIFY_CHANNEL); direct prompt writes must notify it or the services
+# keep serving the cached prompt until the TTL expires
+PROMPT_NOTIFY_CHANNEL = os.environ.get("PROMPT_NOTIFY_CHANNEL", "prompt_updated")
+
 TEST_INPUTS = [
     "Write a function to calculate fibonacci numbers",
     "Create a function that sorts a list of dictionaries by a given key",
@@ -236,12 +241,18 @@ async def get_db_pool(config: BenchmarkConfig) -> asyncpg.Pool:
     )
 
 
+async def notify_prompt_change(conn: asyncpg.Connection, task_type: str):
+    """Invalidate service prompt caches; delivered when the enclosing transaction commits."""
+    await conn.execute("SELECT pg_notify($1, $2)", PROMPT_NOTIFY_CHANNEL, task_type)
+
+
 async def reset_db(pool: asyncpg.Pool):
-    async with pool.acquire() as conn:
+    async with pool.acquire() as conn, conn.transaction():
         await conn.execute("DELETE FROM optimization_reports")
         await conn.execute("DELETE FROM execution_logs")
         await conn.execute("DELETE FROM prompts WHERE version > 1")
         await conn.execute("UPDATE prompts SET is_active = TRUE WHERE version = 1")
+        await notify_prompt_change(conn, "code_generation")
 
 
 async def get_next_prompt_version(pool: asyncpg.Pool) -> int:
@@ -253,7 +264,7 @@ async def get_next_prompt_version(pool: asyncpg.Pool) -> int:
 
 
 async def inject_bad_prompt(pool: asyncpg.Pool, content: str, version: int):
-    async with pool.acquire() as conn:
+    async with pool.acquire() as conn, conn.transaction():
         await conn.execute(
             "UPDATE prompts SET is_active = FALSE WHERE task_type = 'code_generation' AND is_active = TRUE"
         )
@@ -263,6 +274,7 @@ async def inject_bad_prompt(pool: asyncpg.Pool, content: str, version: int):
             content,
             version,
         )
+        await notify_prompt_change(conn, "code_generation")
 
 
 async def get_active_prompt(pool: asyncpg.Pool) -> tuple[str, int]:
@@ -599,6 +611,8 @@ def generate_json_report(benchmark: BenchmarkResult, db_data: dict) -> dict:
             cycle_dict["optimization_report"] = {
                 "before_version": c.optimization_report.get("before_prompt_version"),
                 "after_version": c.optimization_report.get("after_prompt_version"),
+                "before_prompt_tokens": c.optimization_report.get("before_prompt_tokens"),
+                "after_prompt_tokens": c.optimization_report.get("after_prompt_tokens"),
                 "failure_analysis": c.optimization_report.get("failure_analysis"),
             }
         cycles_data.append(cycle_dict)
@@ -710,6 +724,12 @@ def generate_markdown_report(benchmark: BenchmarkResult, db_data: dict) -> str:
             lines.append(f"- **Failure Patterns**: {', '.join(patterns) if patterns else 'N/A'}")
             lines.append(f"- **Root Causes**: {', '.join(causes) if causes else 'N/A'}")
             lines.append(f"- **Suggestions**: {', '.join(suggestions) if suggestions else 'N/A'}")
+            before_tokens = c.optimization_report.get("before_prompt_tokens")
+            after_tokens = c.optimization_report.get("after_prompt_tokens")
+            if before_tokens is not None and after_tokens is not None:
+                lines.append(
+                    f"- **Prompt Tokens (est.)**: {before_tokens} -> {after_tokens} ({after_tokens - before_tokens:+d})"
+                )
             lines.append("")
 
         if c.after:
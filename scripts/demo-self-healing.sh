@@ -54,6 +54,8 @@ BAD_PROMPT_SQL="
         'Demo: injected bad prompt',
         'demo'
     );
+    -- Invalidate the worker and manager prompt caches (delivered on commit)
+    SELECT pg_notify('prompt_updated', 'code_generation');
 "
 if command -v docker &>/dev/null; then
     docker compose exec -T postgres psql -U agent -d agent_system -c "${BAD_PROMPT_SQL}" 2>/dev/null
@@ -29,9 +29,11 @@ kubectl wait --for=condition=ready pod -l app=postgres -n ${NAMESPACE} --timeout
 echo "[3/5] Deploying application services..."
 kubectl apply -f k8s/worker/deployment.yaml
 kubectl apply -f k8s/worker/service.yaml
+kubectl apply -f k8s/worker/service-headless.yaml
 kubectl apply -f k8s/worker/hpa.yaml
 kubectl apply -f k8s/evaluator/deployment.yaml
 kubectl apply -f k8s/evaluator/service.yaml
+kubectl apply -f k8s/evaluator/service-headless.yaml
 kubectl apply -f k8s/manager/deployment.yaml
 kubectl apply -f k8s/manager/service.yaml
 
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Train the manager's refine-bypass classifier from execution_logs.
+
+A row is a positive example ("refinement not needed") when the raw input
+scored about as well as refined requests of the same task type do:
+  - bypassed rows scoring within --tolerance of the task type's mean
+    score for LLM-refined rows, or
+  - LLM-refined rows whose refinement barely changed the input
+    (similarity >= --unchanged-ratio) and that still scored that well.
+LLM-refined rows that the refiner rewrote substantially and that scored
+well are negatives. Other rows are skipped.
+
+Usage:
+    python scripts/train_refine_gate.py [--limit 20000] [--output refine_gate.json]
+
+Point REFINE_GATE_MODEL_PATH at the output file to use the model.
+"""
+
+import argparse
+import asyncio
+import difflib
+import json
+import os
+import sys
+from collections import defaultdict
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import select
+
+from services.common.db import get_engine, db_session
+from services.common.models import ExecutionLog
+from services.manager.app.services.refine_gate import FEATURES, extract_features
+
+
+async def load_rows(limit: int) -> list[tuple]:
+    stmt = (
+        select(
+            ExecutionLog.task_type, ExecutionLog.user_input, ExecutionLog.refined_input,
+            ExecutionLog.evaluation_score, ExecutionLog.evaluation_detail,
+        )
+        .where(ExecutionLog.evaluation_score.isnot(None), ExecutionLog.refined_input.isnot(None))
+        .order_by(ExecutionLog.created_at.desc())
+        .limit(limit)
+    )
+    async with db_session() as db:
+        rows = (await db.execute(stmt)).all()
+    await get_engine().dispose()
+    return rows
+
+
+def label_rows(rows: list[tuple], tolerance: float, unchanged_ratio: float) -> tuple[list[str], list[int]]:
+    refined_scores = defaultdict(list)
+    for task_type, _, _, score, detail in rows:
+        if (detail or {}).get("refine_decision", "llm") == "llm":
+            refined_scores[task_type].append(score)
+    baseline = {t: sum(s) / len(s) for t, s in refined_scores.items()}
+
+    inputs, labels = [], []
+    for task_type, user_input, refined_input, score, detail in rows:
+        if task_type not in baseline:
+            continue
+        good = score >= baseline[task_type] - tolerance
+        decision = (detail or {}).get("refine_decision", "llm")
+        if decision == "bypassed":
+            inputs.append(user_input)
+            labels.append(int(good))
+        elif decision == "llm" and good:
+            ratio = difflib.SequenceMatcher(None, user_input, refined_input).ratio()
+            inputs.append(user_input)
+            labels.append(int(ratio >= unchanged_ratio))
+    return inputs, labels
+
+
+def fit(inputs: list[str], labels: list[int], epochs: int, lr: float, l2: float) -> dict:
+    x = np.array([[extract_features(text)[name] for name in FEATURES] for text in inputs], dtype=np.float64)
+    y = np.array(labels, dtype=np.float64)
+    w = np.zeros(x.shape[1])
+    b = 0.0
+    for _ in range(epochs):
+        p = 1.0 / (1.0 + np.exp(-(x @ w + b)))
+        grad = p - y
+        w -= lr * (x.T @ grad / len(y) + l2 * w)
+        b -= lr * grad.mean()
+    p = 1.0 / (1.0 + np.exp(-(x @ w + b)))
+    accuracy = float(((p >= 0.5) == (y == 1)).mean())
+    print(f"Trained on {len(y)} rows ({int(y.sum())} positive), training accuracy {accuracy:.3f}")
+    return {"bias": round(b, 6), "weights": {name: round(float(v), 6) for name, v in zip(FEATURES, w)}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the refine-bypass classifier")
+    parser.add_argument("--limit", type=int, default=20000)
+    parser.add_argument("--tolerance", type=float, default=0.05)
+    parser.add_argument("--unchanged-ratio", type=float, default=0.8)
+    parser.add_argument("--epochs", type=int, default=2000)
+    parser.add_argument("--lr", type=float, default=0.5)
+    parser.add_argument("--l2", type=float, default=0.001)
+    parser.add_argument("--output", default="refine_gate.json")
+    args = parser.parse_args()
+
+    rows = asyncio.run(load_rows(args.limit))
+    inputs, labels = label_rows(rows, args.tolerance, args.unchanged_ratio)
+    if len(set(labels)) < 2:
+        print(f"Need both positive and negative examples; got {len(labels)} labelled rows. Nothing written.")
+        sys.exit(1)
+
+    model = fit(inputs, labels, args.epochs, args.lr, args.l2)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(model, f, indent=2)
+    print(f"Model written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,35 @@
+import time
+from contextlib import asynccontextmanager
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
 from services.common.config import get_settings
+from services.common.metrics import DB_POOL_CHECKED_OUT, DB_POOL_WAIT, DB_CONNECTION_HOLD
+from services.common.tracing import instrument_engine
 
 _engine = None
 _session_factory = None
 
 
+def _instrument_pool(engine) -> None:
+    """Track checked-out connections and how long each checkout is held."""
+    pool = engine.sync_engine.pool
+
+    @event.listens_for(pool, "checkout")
+    def _on_checkout(dbapi_conn, record, proxy):
+        record.info["checkout_at"] = time.perf_counter()
+        DB_POOL_CHECKED_OUT.inc()
+
+    @event.listens_for(pool, "checkin")
+    def _on_checkin(dbapi_conn, record):
+        checkout_at = record.info.pop("checkout_at", None)
+        if checkout_at is not None:
+            DB_POOL_CHECKED_OUT.dec()
+            DB_CONNECTION_HOLD.observe(time.perf_counter() - checkout_at)
+
+
 def get_engine():
     global _engine
     if _engine is None:
@@ -12,9 +37,12 @@ def get_engine():
         _engine = create_async_engine(
             settings.DATABASE_URL,
             echo=False,
-            pool_size=5,
-            max_overflow=10,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
         )
+        _instrument_pool(_engine)
+        instrument_engine(_engine)
     return _engine
 
 
@@ -33,3 +61,25 @@ async def get_db() -> AsyncSession:
     factory = get_session_factory()
     async with factory() as session:
         yield session
+
+
+@asynccontextmanager
+async def db_session():
+    """Short-lived session: checks a connection out eagerly and returns it on exit.
+
+    Use this instead of a request-scoped ``Depends(get_db)`` when the request
+    also awaits slow work (LLM calls), so the pooled connection is only held
+    for the duration of the queries.
+    """
+    factory = get_session_factory()
+    async with factory() as session:
+        start = time.perf_counter()
+        await session.connection()
+        DB_POOL_WAIT.observe(time.perf_counter() - start)
+        yield session
+
+
+def get_asyncpg_dsn() -> str:
+    """Plain asyncpg DSN for connections that live outside the SQLAlchemy pool (e.g. LISTEN)."""
+    url = make_url(get_settings().DATABASE_URL).set(drivername="postgresql")
+    return url.render_as_string(hide_password=False)
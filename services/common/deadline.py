@@ -0,0 +1,140 @@
+import asyncio
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import AsyncIterator, Awaitable, Optional, TypeVar
+
+import httpx
+
+from services.common.config import get_settings
+from services.common.metrics import DEADLINE_FALLBACKS
+
+T = TypeVar("T")
+
+# Remaining budget in milliseconds, relative so pod clock skew doesn't matter
+DEADLINE_HEADER = "X-Request-Timeout-Ms"
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a stage runs past the request deadline."""
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current request's budget, or None when there is no deadline."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(deadline - time.monotonic(), 0.0)
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]):
+    """Run the enclosed code under a deadline `seconds` from now (None: no deadline)."""
+    value = time.monotonic() + max(seconds, 0.0) if seconds is not None else None
+    token = _deadline.set(value)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def default_deadline_seconds() -> Optional[float]:
+    """REQUEST_DEADLINE_SECONDS, or None when deadlines are disabled."""
+    seconds = get_settings().REQUEST_DEADLINE_SECONDS
+    return seconds if seconds > 0 else None
+
+
+def deadline_headers() -> dict[str, str]:
+    """Header carrying the remaining budget to the next hop, if a deadline is set."""
+    left = remaining()
+    return {} if left is None else {DEADLINE_HEADER: str(int(left * 1000))}
+
+
+async def with_deadline(aw: Awaitable[T], share: float = 1.0) -> T:
+    """Await `aw` within `share` of the remaining budget. Raises DeadlineExceeded on expiry."""
+    left = remaining()
+    if left is None:
+        return await aw
+    try:
+        return await asyncio.wait_for(aw, timeout=left * share)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(f"Deadline exceeded after {left * share:.2f}s")
+
+
+async def iter_with_deadline(items: AsyncIterator[T]) -> AsyncIterator[T]:
+    """Yield from `items` until the request deadline. Raises DeadlineExceeded on expiry.
+
+    The budget covers the whole iteration, not each item, so a slow trickle
+    of chunks cannot outlive the request.
+    """
+    iterator = items.__aiter__()
+    while True:
+        left = remaining()
+        try:
+            if left is None:
+                item = await iterator.__anext__()
+            else:
+                item = await asyncio.wait_for(iterator.__anext__(), timeout=left)
+        except StopAsyncIteration:
+            return
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded("Deadline exceeded while streaming")
+        yield item
+
+
+def is_deadline_error(error: BaseException) -> bool:
+    """True for downstream errors caused by the request budget running out, not by the callee.
+
+    Covers the callee's own 504 on deadline expiry and client timeouts that
+    fired once the budget was spent (the read timeout is cut to the remaining
+    budget per hop). Neither says anything about the callee's health.
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 504
+    return isinstance(error, httpx.TimeoutException) and remaining() == 0.0
+
+
+def record_fallback(service: str, stage: str) -> None:
+    DEADLINE_FALLBACKS.labels(service=service, stage=stage).inc()
+
+
+class DeadlineMiddleware:
+    """ASGI middleware: sets the request deadline from DEADLINE_HEADER, else `default_seconds`.
+
+    At a public entry point pass `min_seconds` / `max_seconds` so a client
+    cannot ask for a budget too short to do any work or longer than the
+    service is willing to hold a request.
+    """
+
+    def __init__(
+        self,
+        app,
+        default_seconds: Optional[float] = None,
+        min_seconds: Optional[float] = None,
+        max_seconds: Optional[float] = None,
+    ):
+        self.app = app
+        self.default_seconds = default_seconds
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        seconds = self.default_seconds
+        header = DEADLINE_HEADER.lower().encode("latin-1")
+        for name, value in scope.get("headers", []):
+            if name == header:
+                try:
+                    seconds = int(value) / 1000
+                except ValueError:
+                    break
+                if self.min_seconds is not None:
+                    seconds = max(seconds, self.min_seconds)
+                if self.max_seconds is not None:
+                    seconds = min(seconds, self.max_seconds)
+                break
+        with deadline_scope(seconds):
+            await self.app(scope, receive, send)
@@ -0,0 +1,166 @@
+import asyncio
+import functools
+import inspect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from services.common.config import get_settings
+from services.common.deadline import DeadlineExceeded
+from services.common.metrics import STAGE_DURATION, STAGE_IN_FLIGHT, LLM_TOKENS, LLM_BILLED_TOKENS, LLM_COST
+from services.common.schemas import TokenUsage
+from services.common.tracing import current_span, exemplar, span
+
+OUTCOME_SUCCESS = "success"
+OUTCOME_ERROR = "error"
+OUTCOME_TIMEOUT = "timeout"
+OUTCOME_CANCELLED = "cancelled"
+
+# (service, stage) of the innermost running stage, so LLM callbacks can label tokens
+_current_stage: ContextVar[Optional[tuple[str, str]]] = ContextVar("current_stage", default=None)
+# (accumulator, task_type, prompt_version) of the innermost track_usage block
+_tracked_usage: ContextVar[Optional[tuple[TokenUsage, str, str]]] = ContextVar("tracked_usage", default=None)
+
+
+def current_stage() -> Optional[tuple[str, str]]:
+    return _current_stage.get()
+
+
+def _outcome(exc: Optional[BaseException]) -> str:
+    if exc is None:
+        return OUTCOME_SUCCESS
+    if isinstance(exc, (DeadlineExceeded, asyncio.TimeoutError)):
+        return OUTCOME_TIMEOUT
+    if isinstance(exc, (asyncio.CancelledError, GeneratorExit)):
+        return OUTCOME_CANCELLED
+    return OUTCOME_ERROR
+
+
+class stage:
+    """Record duration, in-flight count and outcome for one pipeline stage.
+
+    Use as a context manager (``with stage("worker", "llm"):``) or as a
+    decorator on sync or async functions. Sync ``with`` also works inside
+    coroutines. Outcome is success, error, timeout (deadline or asyncio
+    timeout) or cancelled. The exception, if any, is re-raised. Each stage
+    is also a tracing span, and its duration sample carries the trace and
+    request IDs as an exemplar.
+    """
+
+    def __init__(self, service: str, name: str):
+        self.service = service
+        self.name = name
+
+    def __enter__(self) -> "stage":
+        STAGE_IN_FLIGHT.labels(service=self.service, stage=self.name).inc()
+        self._token = _current_stage.set((self.service, self.name))
+        self._span = span(self.name, service=self.service)
+        self._span.__enter__()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        elapsed = time.perf_counter() - self._start
+        outcome = _outcome(exc)
+        STAGE_DURATION.labels(service=self.service, stage=self.name, outcome=outcome).observe(
+            elapsed, exemplar=exemplar(),
+        )
+        self._span.__exit__(exc_type, exc, tb)
+        try:
+            _current_stage.reset(self._token)
+        except ValueError:
+            # Exited from another context (e.g. a stream closed by a different task)
+            pass
+        STAGE_IN_FLIGHT.labels(service=self.service, stage=self.name).dec()
+
+    def __call__(self, fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with stage(self.service, self.name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(self.service, self.name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+def llm_cost_usd(input_tokens: int, output_tokens: int) -> float:
+    settings = get_settings()
+    return (
+        input_tokens * settings.LLM_INPUT_COST_PER_MILLION_TOKENS
+        + output_tokens * settings.LLM_OUTPUT_COST_PER_MILLION_TOKENS
+    ) / 1_000_000
+
+
+@contextmanager
+def track_usage(task_type: str, prompt_version: Optional[int] = None) -> Iterator[TokenUsage]:
+    """Sum the billed LLM usage of calls made inside the block.
+
+    Also supplies the task_type and prompt_version labels for the token
+    and cost counters of those calls.
+    """
+    usage = TokenUsage()
+    version = str(prompt_version) if prompt_version is not None else "none"
+    token = _tracked_usage.set((usage, task_type, version))
+    try:
+        yield usage
+    finally:
+        try:
+            _tracked_usage.reset(token)
+        except ValueError:
+            # Exited from another context (e.g. a stream closed by a different task)
+            pass
+
+
+class TokenUsageHandler(BaseCallbackHandler):
+    """Observes prompt/completion token counts for chat models that report usage_metadata.
+
+    Billed calls also feed the token and cost counters and the enclosing
+    ``track_usage`` block. LangChain marks response-cache hits with a
+    ``total_cost`` of 0; those reach the per-call histogram only.
+    """
+
+    # Run in the caller's context so current_stage() sees the enclosing stage
+    run_inline = True
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        service, name = current_stage() or ("unknown", "unknown")
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if not usage:
+                    continue
+                input_tokens = usage.get("input_tokens", 0)
+                output_tokens = usage.get("output_tokens", 0)
+                LLM_TOKENS.labels(service=service, stage=name, kind="input").observe(input_tokens)
+                LLM_TOKENS.labels(service=service, stage=name, kind="output").observe(output_tokens)
+                llm_span = current_span()
+                if llm_span is not None:
+                    llm_span.set_attribute("llm.input_tokens", input_tokens)
+                    llm_span.set_attribute("llm.output_tokens", output_tokens)
+                if usage.get("total_cost") == 0:
+                    continue
+                self._bill(service, name, input_tokens, output_tokens)
+
+    @staticmethod
+    def _bill(service: str, name: str, input_tokens: int, output_tokens: int) -> None:
+        tracked = _tracked_usage.get()
+        task_type, prompt_version = (tracked[1], tracked[2]) if tracked else ("unknown", "none")
+        cost = llm_cost_usd(input_tokens, output_tokens)
+        labels = {"service": service, "stage": name, "task_type": task_type, "prompt_version": prompt_version}
+        LLM_BILLED_TOKENS.labels(**labels, kind="input").inc(input_tokens)
+        LLM_BILLED_TOKENS.labels(**labels, kind="output").inc(output_tokens)
+        LLM_COST.labels(**labels).inc(cost)
+        if tracked:
+            accumulated = tracked[0]
+            accumulated.input_tokens += input_tokens
+            accumulated.output_tokens += output_tokens
+            accumulated.cost_usd += cost
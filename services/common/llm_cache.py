@@ -0,0 +1,168 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core._api import suppress_langchain_beta_warning
+from langchain_core.load import dumps, loads
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, Generation
+from langchain_core.runnables.config import run_in_executor
+
+from services.common.logging_utils import setup_logger
+from services.common.lru import LRUCache
+from services.common.metrics import LLM_CACHE_REQUESTS
+
+logger = setup_logger("common.llm_cache")
+
+# Trim the on-disk store every N writes rather than on each one
+_SQLITE_TRIM_EVERY = 100
+
+# Only response types may be revived from the disk store
+_ALLOWED_OBJECTS = [Generation, ChatGeneration, ChatGenerationChunk, AIMessage, AIMessageChunk]
+
+
+def _cache_key(prompt: str, llm_string: str) -> str:
+    # llm_string carries model + temperature (+ stop etc.), prompt the full message list
+    return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+
+class SQLiteResponseStore:
+    """On-disk response store shared by all uvicorn worker processes on a pod.
+
+    WAL mode lets several processes read while one writes. Entries expire
+    after ``ttl_seconds``. The least recently used rows are trimmed once the
+    table grows past ``max_entries``.
+    """
+
+    def __init__(self, path: str, ttl_seconds: Optional[float], max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache(accessed_at)")
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self.ttl_seconds is not None and now - created_at >= self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._writes += 1
+            if self._writes % _SQLITE_TRIM_EVERY == 0:
+                self._trim(now)
+
+    def _trim(self, now: float) -> None:
+        if self.ttl_seconds is not None:
+            self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN"
+                " (SELECT key FROM llm_cache ORDER BY accessed_at ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+
+
+class TieredLLMCache(BaseCache):
+    """LangChain response cache: in-process LRU in front of an optional SQLite store.
+
+    Plugged into chat models via their ``cache=`` field, so every
+    ``chain.ainvoke`` through ``get_llm`` is served from here when the exact
+    same (model, temperature, messages) was seen before. Memory hits are
+    answered without leaving the event loop; only disk access goes to a thread.
+    """
+
+    def __init__(self, memory: LRUCache, disk: Optional[SQLiteResponseStore] = None):
+        self.memory = memory
+        self.disk = disk
+
+    def _lookup_memory(self, key: str) -> Optional[RETURN_VAL_TYPE]:
+        value = self.memory.get(key)
+        LLM_CACHE_REQUESTS.labels(tier="memory", result="miss" if value is None else "hit").inc()
+        return value
+
+    def _lookup_disk(self, key: str) -> Optional[RETURN_VAL_TYPE]:
+        # May run in a worker thread: does not touch the in-memory LRU
+        if self.disk is None:
+            return None
+        try:
+            raw = self.disk.get(key)
+        except sqlite3.Error as e:
+            logger.warning("llm_cache_disk_read_failed", extra={"error": str(e)})
+            raw = None
+        if raw is None:
+            LLM_CACHE_REQUESTS.labels(tier="disk", result="miss").inc()
+            return None
+        LLM_CACHE_REQUESTS.labels(tier="disk", result="hit").inc()
+        with suppress_langchain_beta_warning():
+            return loads(raw, allowed_objects=_ALLOWED_OBJECTS)
+
+    def _write_disk(self, key: str, return_val: RETURN_VAL_TYPE) -> None:
+        try:
+            self.disk.set(key, dumps(return_val))
+        except sqlite3.Error as e:
+            logger.warning("llm_cache_disk_write_failed", extra={"error": str(e)})
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = _cache_key(prompt, llm_string)
+        value = self._lookup_memory(key)
+        if value is None:
+            value = self._lookup_disk(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = _cache_key(prompt, llm_string)
+        self.memory.set(key, return_val)
+        if self.disk is not None:
+            self._write_disk(key, return_val)
+
+    def clear(self, **kwargs: Any) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = _cache_key(prompt, llm_string)
+        value = self._lookup_memory(key)
+        if value is not None or self.disk is None:
+            return value
+        value = await run_in_executor(None, self._lookup_disk, key)
+        if value is not None:
+            self.memory.set(key, value)
+        return value
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = _cache_key(prompt, llm_string)
+        self.memory.set(key, return_val)
+        if self.disk is not None:
+            await run_in_executor(None, self._write_disk, key, return_val)
@@ -0,0 +1,272 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from services.common.config import get_settings
+from services.common.db import db_session
+from services.common.instrumentation import stage
+from services.common.logging_utils import setup_logger
+from services.common.metrics import (
+    LOG_SINK_QUEUE_DEPTH, LOG_SINK_FLUSH_LATENCY, LOG_SINK_FLUSH_SIZE, LOG_SINK_ROWS,
+)
+from services.common.models import ExecutionLog
+
+logger = setup_logger("common.log_sink")
+
+OVERFLOW_SPILL = "spill"
+OVERFLOW_DROP = "drop"
+
+# Every column but the serial PK, so executemany rows share one key set
+_COLUMNS = [c.key for c in ExecutionLog.__table__.columns if c.key != "id"]
+
+
+def _to_row(log: ExecutionLog) -> dict:
+    row = {key: getattr(log, key) for key in _COLUMNS}
+    # Column defaults only fire at INSERT time; stamp them now so a buffered
+    # row keeps its real request time and id.
+    if row["request_id"] is None:
+        row["request_id"] = uuid.uuid4()
+    if row["created_at"] is None:
+        row["created_at"] = datetime.now(timezone.utc)
+    return row
+
+
+def _dump_row(row: dict) -> str:
+    return json.dumps({
+        **row,
+        "request_id": str(row["request_id"]),
+        "created_at": row["created_at"].isoformat(),
+    })
+
+
+def _load_row(line: str) -> dict:
+    row = json.loads(line)
+    row["request_id"] = uuid.UUID(row["request_id"])
+    row["created_at"] = datetime.fromisoformat(row["created_at"])
+    return row
+
+
+def _is_row_error(error: Exception) -> bool:
+    """The DB refused these rows (constraint, value), as opposed to being unreachable."""
+    return isinstance(error, (IntegrityError, DataError))
+
+
+class ExecutionLogSink:
+    """Write-behind buffer for ExecutionLog rows.
+
+    Rows are queued in memory and flushed as multi-row INSERTs when
+    ``batch_size`` rows are waiting or every ``flush_interval`` seconds.
+    When the queue is full, the overflow policy either spills rows to a
+    JSONL file or drops them. Rows from a failed flush are spilled too.
+    Spilled rows are replayed after the next successful flush. Spill lines
+    that don't parse, and rows the DB refuses on their own, are moved to a
+    ``.rejected`` file instead of being replayed forever. ``stop()`` drains
+    the queue.
+    """
+
+    def __init__(
+        self,
+        max_queue: int,
+        batch_size: int,
+        flush_interval: float,
+        overflow_policy: str = OVERFLOW_SPILL,
+        spill_path: Optional[str] = None,
+    ):
+        if overflow_policy not in (OVERFLOW_SPILL, OVERFLOW_DROP):
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.spill_path = spill_path
+        self._buffer: deque[dict] = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done() and not self._closing
+
+    def start(self) -> None:
+        self._closing = False
+        self._task = asyncio.create_task(self._run(), name="execution-log-sink")
+        logger.info("log_sink_started", extra={
+            "batch_size": self.batch_size,
+            "flush_interval": self.flush_interval,
+            "overflow_policy": self.overflow_policy,
+        })
+
+    async def stop(self) -> None:
+        """Stop the flush loop and drain everything still buffered."""
+        if self._task is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        try:
+            await self._task
+        except Exception as e:
+            # Still drain the buffer and let the rest of shutdown run
+            logger.error("log_sink_task_failed", extra={"error": str(e)})
+        self._task = None
+        await self._flush_buffer()
+        logger.info("log_sink_stopped", extra={"remaining": len(self._buffer)})
+
+    def submit(self, log: ExecutionLog) -> None:
+        """Queue a row without touching the database. Never blocks the caller."""
+        row = _to_row(log)
+        if len(self._buffer) >= self.max_queue:
+            self._overflow([row])
+            return
+        self._buffer.append(row)
+        LOG_SINK_QUEUE_DEPTH.set(len(self._buffer))
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def _overflow(self, rows: list[dict]) -> None:
+        if self.overflow_policy == OVERFLOW_SPILL and self.spill_path:
+            self._spill(rows)
+        else:
+            LOG_SINK_ROWS.labels(result="dropped").inc(len(rows))
+            logger.warning("log_sink_rows_dropped", extra={"count": len(rows)})
+
+    def _spill(self, rows: list[dict]) -> None:
+        try:
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(_dump_row(row) + "\n")
+            LOG_SINK_ROWS.labels(result="spilled").inc(len(rows))
+            logger.warning("log_sink_rows_spilled", extra={"count": len(rows), "path": self.spill_path})
+        except OSError as e:
+            LOG_SINK_ROWS.labels(result="dropped").inc(len(rows))
+            logger.error("log_sink_spill_failed", extra={"count": len(rows), "error": str(e)})
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            # One bad iteration must not end the loop, or submitted rows would never be flushed
+            try:
+                if await self._flush_buffer():
+                    await self._replay_spill()
+            except Exception as e:
+                logger.error("log_sink_iteration_failed", extra={"error": str(e)})
+
+    async def _flush_buffer(self) -> bool:
+        ok = True
+        while self._buffer:
+            batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            LOG_SINK_QUEUE_DEPTH.set(len(self._buffer))
+            if await self._write(batch) is not None:
+                self._overflow(batch)
+                ok = False
+        return ok
+
+    async def _write(self, rows: list[dict]) -> Optional[Exception]:
+        """Insert rows in one statement. Returns the error, or None on success."""
+        start = time.perf_counter()
+        try:
+            # Only the manager runs a log sink
+            with stage("manager", "db_write"):
+                async with db_session() as db:
+                    # executemany: sent as multi-row INSERT ... VALUES batches
+                    await db.execute(insert(ExecutionLog), rows)
+                    await db.commit()
+        except Exception as e:
+            LOG_SINK_ROWS.labels(result="failed").inc(len(rows))
+            logger.error("log_sink_flush_failed", extra={"count": len(rows), "error": str(e)})
+            return e
+        LOG_SINK_FLUSH_LATENCY.observe(time.perf_counter() - start)
+        LOG_SINK_FLUSH_SIZE.observe(len(rows))
+        LOG_SINK_ROWS.labels(result="flushed").inc(len(rows))
+        return None
+
+    def _quarantine(self, lines: list[str], reason: str) -> None:
+        path = self.spill_path + ".rejected"
+        try:
+            with open(path, "a", encoding="utf-8") as f:
+                for line in lines:
+                    f.write(line + "\n")
+        except OSError as e:
+            LOG_SINK_ROWS.labels(result="dropped").inc(len(lines))
+            logger.error("log_sink_quarantine_failed", extra={"count": len(lines), "error": str(e)})
+            return
+        LOG_SINK_ROWS.labels(result="quarantined").inc(len(lines))
+        logger.error("log_sink_rows_quarantined", extra={"count": len(lines), "path": path, "reason": reason})
+
+    async def _replay_batch(self, rows: list[dict]) -> list[dict]:
+        """Write replayed rows; return the ones to spill again because the DB is unavailable.
+
+        A batch the DB refuses is split in halves until the refused rows are
+        isolated, so one bad row doesn't hold back the others.
+        """
+        error = await self._write(rows)
+        if error is None:
+            LOG_SINK_ROWS.labels(result="replayed").inc(len(rows))
+            return []
+        if not _is_row_error(error):
+            return rows
+        if len(rows) == 1:
+            self._quarantine([_dump_row(rows[0])], reason=str(error))
+            return []
+        mid = len(rows) // 2
+        return await self._replay_batch(rows[:mid]) + await self._replay_batch(rows[mid:])
+
+    async def _replay_spill(self) -> None:
+        if not self.spill_path:
+            return
+        # Rename first so rows spilled during the replay land in a fresh file.
+        # A replay file left behind by a crash is picked up before the spill file.
+        replay_path = self.spill_path + ".replay"
+        if not os.path.exists(replay_path):
+            if not os.path.exists(self.spill_path):
+                return
+            os.replace(self.spill_path, replay_path)
+        rows, unparseable = [], []
+        with open(replay_path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    rows.append(_load_row(line))
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    # e.g. a line truncated by a crash mid-append
+                    unparseable.append(line.rstrip("\n"))
+        if unparseable:
+            self._quarantine(unparseable, reason="unparseable")
+        os.remove(replay_path)
+
+        for i in range(0, len(rows), self.batch_size):
+            unwritten = await self._replay_batch(rows[i:i + self.batch_size])
+            if unwritten:
+                self._spill(unwritten + rows[i + self.batch_size:])
+                return
+        logger.info("log_sink_spill_replayed", extra={"count": len(rows)})
+
+
+_sink: Optional[ExecutionLogSink] = None
+
+
+def get_log_sink() -> ExecutionLogSink:
+    global _sink
+    if _sink is None:
+        settings = get_settings()
+        _sink = ExecutionLogSink(
+            max_queue=settings.LOG_SINK_MAX_QUEUE,
+            batch_size=settings.LOG_SINK_BATCH_SIZE,
+            flush_interval=settings.LOG_SINK_FLUSH_INTERVAL_SECONDS,
+            overflow_policy=settings.LOG_SINK_OVERFLOW_POLICY,
+            spill_path=settings.LOG_SINK_SPILL_PATH or None,
+        )
+    return _sink
@@ -0,0 +1,61 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Bounded mapping with least-recently-used eviction and an optional per-entry TTL."""
+
+    def __init__(self, maxsize: int, ttl_seconds: Optional[float] = None):
+        if maxsize < 1:
+            raise ValueError("maxsize must be >= 1")
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._data: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds is not None and time.monotonic() - stored_at >= self.ttl_seconds
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        value, stored_at = entry
+        if self._expired(stored_at):
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def age(self, key: Hashable) -> Optional[float]:
+        """Seconds since the entry was stored, or None if absent."""
+        entry = self._data.get(key)
+        return None if entry is None else time.monotonic() - entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._data[key] = (value, time.monotonic())
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self) -> None:
+        self._data.clear()
@@ -1,5 +1,15 @@
 from prometheus_client import Counter, Histogram, Gauge
 
+from services.common.config import get_settings
+
+
+def _buckets(raw: str) -> list[float]:
+    return sorted(float(b) for b in raw.split(",") if b.strip())
+
+
+LATENCY_BUCKETS = _buckets(get_settings().METRICS_LATENCY_BUCKETS)
+TOKEN_BUCKETS = _buckets(get_settings().METRICS_TOKEN_BUCKETS)
+
 # Request counters
 REQUEST_COUNT = Counter(
     "agent_requests_total",
@@ -12,7 +22,40 @@ REQUEST_LATENCY = Histogram(
     "agent_request_duration_seconds",
     "Request latency in seconds",
     ["service", "endpoint"],
-    buckets=[0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0],
+    buckets=LATENCY_BUCKETS,
+)
+
+# Per-stage instrumentation (services.common.instrumentation.stage)
+STAGE_DURATION = Histogram(
+    "agent_stage_duration_seconds",
+    "Pipeline stage duration in seconds, by outcome",
+    ["service", "stage", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+
+STAGE_IN_FLIGHT = Gauge(
+    "agent_stage_in_flight",
+    "Pipeline stage executions currently running",
+    ["service", "stage"],
+)
+
+LLM_TOKENS = Histogram(
+    "agent_llm_tokens",
+    "Tokens per LLM call as reported by the provider (estimated for the mock)",
+    ["service", "stage", "kind"],
+    buckets=TOKEN_BUCKETS,
+)
+
+LLM_BILLED_TOKENS = Counter(
+    "agent_llm_billed_tokens_total",
+    "Billed LLM tokens (response-cache hits excluded)",
+    ["service", "stage", "task_type", "prompt_version", "kind"],
+)
+
+LLM_COST = Counter(
+    "agent_llm_cost_usd_total",
+    "Estimated LLM spend in USD from token counts and configured prices",
+    ["service", "stage", "task_type", "prompt_version"],
 )
 
 # Evaluation scores
@@ -36,9 +79,301 @@ PROMPT_VERSION = Gauge(
     ["task_type"],
 )
 
+PROMPT_TOKENS = Gauge(
+    "agent_prompt_tokens",
+    "Estimated token length of the active prompt, set when the optimizer patches it",
+    ["task_type"],
+)
+
+# Manager async jobs
+JOB_QUEUE_DEPTH = Gauge(
+    "agent_job_queue_depth",
+    "Async pipeline jobs waiting for an executor slot",
+)
+
+JOBS_TOTAL = Counter(
+    "agent_jobs_total",
+    "Async pipeline jobs by lifecycle status",
+    ["status"],
+)
+
+BATCH_ITEMS_TOTAL = Counter(
+    "agent_batch_items_total",
+    "Batch submission items by outcome",
+    ["status"],
+)
+
+# Write-behind ExecutionLog sink
+LOG_SINK_QUEUE_DEPTH = Gauge(
+    "agent_log_sink_queue_depth",
+    "ExecutionLog rows buffered and waiting to be flushed",
+)
+
+LOG_SINK_FLUSH_LATENCY = Histogram(
+    "agent_log_sink_flush_duration_seconds",
+    "Time to write one batch of ExecutionLog rows",
+    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0],
+)
+
+LOG_SINK_FLUSH_SIZE = Histogram(
+    "agent_log_sink_flush_rows",
+    "Rows written per ExecutionLog flush",
+    buckets=[1, 5, 10, 25, 50, 100, 200, 500, 1000],
+)
+
+LOG_SINK_ROWS = Counter(
+    "agent_log_sink_rows_total",
+    "ExecutionLog rows by sink outcome",
+    ["result"],
+)
+
+COALESCED_REQUESTS = Counter(
+    "agent_coalesced_requests_total",
+    "Requests that joined an identical in-flight pipeline instead of starting one",
+    ["task_type"],
+)
+
+IDEMPOTENCY_REQUESTS = Counter(
+    "agent_idempotency_requests_total",
+    "Requests carrying an Idempotency-Key, by whether they ran, attached, replayed or mismatched",
+    ["result"],
+)
+
+RESULT_CACHE_REQUESTS = Counter(
+    "agent_result_cache_requests_total",
+    "End-to-end result cache lookups",
+    ["task_type", "result"],
+)
+
+PIPELINE_LATENCY = Histogram(
+    "agent_pipeline_duration_seconds",
+    "Refine/worker/evaluate latency by whether the result was computed or served from cache",
+    ["task_type", "source"],
+    buckets=[0.005, 0.05, 0.25, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0],
+)
+
+# LLM response cache
+LLM_CACHE_REQUESTS = Counter(
+    "agent_llm_cache_requests_total",
+    "LLM response cache lookups by tier",
+    ["tier", "result"],
+)
+
+# Worker prompt cache
+PROMPT_CACHE_REQUESTS = Counter(
+    "agent_prompt_cache_requests_total",
+    "Prompt cache lookups",
+    ["task_type", "result"],
+)
+
+PROMPT_CACHE_STALENESS = Histogram(
+    "agent_prompt_cache_staleness_seconds",
+    "Age of cached prompts when served",
+    ["task_type"],
+    buckets=[0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0],
+)
+
+PROMPT_CACHE_INVALIDATIONS = Counter(
+    "agent_prompt_cache_invalidations_total",
+    "Prompt cache invalidations",
+    ["reason"],
+)
+
 # Optimization events
 OPTIMIZATION_RUNS = Counter(
     "agent_optimization_runs_total",
     "Total optimization runs",
     ["task_type", "result"],
 )
+
+# Inter-service HTTP client pools
+HTTP_CLIENT_IN_FLIGHT = Gauge(
+    "agent_http_client_in_flight",
+    "In-flight requests on the shared HTTP client",
+    ["service", "target"],
+)
+
+HTTP_CLIENT_POOL_LIMIT = Gauge(
+    "agent_http_client_pool_max_connections",
+    "Configured max connections of the shared HTTP client pool",
+    ["service", "target"],
+)
+
+HTTP_CLIENT_POOL_TIMEOUTS = Counter(
+    "agent_http_client_pool_timeouts_total",
+    "Requests that timed out waiting for a pooled connection",
+    ["service", "target"],
+)
+
+# Database connection pool
+DB_POOL_CHECKED_OUT = Gauge(
+    "agent_db_pool_checked_out",
+    "Database connections currently checked out of the pool",
+)
+
+DB_POOL_WAIT = Histogram(
+    "agent_db_pool_wait_seconds",
+    "Time spent waiting to check a connection out of the pool",
+    buckets=[0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0],
+)
+
+DB_CONNECTION_HOLD = Histogram(
+    "agent_db_connection_hold_seconds",
+    "Time a connection stays checked out before returning to the pool",
+    buckets=[0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, 60.0],
+)
+
+# Manager near-duplicate refinement index
+REFINE_INDEX_REQUESTS = Counter(
+    "agent_refine_index_requests_total",
+    "Refinement index lookups by result",
+    ["task_type", "result"],
+)
+
+REFINE_INDEX_SIZE = Gauge(
+    "agent_refine_index_entries",
+    "Entries currently held in the refinement index",
+)
+
+REFINE_INDEX_SIMILARITY = Histogram(
+    "agent_refine_index_hit_similarity",
+    "Cosine similarity of refinement index hits",
+    buckets=[0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.98, 1.0],
+)
+
+# Manager refinement stage
+REFINE_DECISIONS = Counter(
+    "agent_refine_decisions_total",
+    "How the refined input was produced: bypassed, index, llm or fused",
+    ["task_type", "decision"],
+)
+
+REFINE_LATENCY = Histogram(
+    "agent_refine_duration_seconds",
+    "Refinement stage latency by decision",
+    ["decision"],
+    buckets=[0.0005, 0.001, 0.005, 0.05, 0.25, 1.0, 2.5, 5.0, 10.0, 30.0],
+)
+
+# Manager deferred evaluation
+EVAL_QUEUE_DEPTH = Gauge(
+    "agent_eval_queue_depth",
+    "Deferred evaluations waiting for an evaluator call",
+)
+
+EVAL_TASKS_TOTAL = Counter(
+    "agent_eval_tasks_total",
+    "Deferred evaluation tasks by outcome",
+    ["status"],
+)
+
+EVAL_LAG = Histogram(
+    "agent_eval_lag_seconds",
+    "Time from response to the ExecutionLog row being evaluated",
+    ["task_type"],
+    buckets=[0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0],
+)
+
+# Request deadlines
+DEADLINE_FALLBACKS = Counter(
+    "agent_deadline_fallbacks_total",
+    "Stages that ran out of their share of the request deadline and fell back",
+    ["service", "stage"],
+)
+
+# Manager circuit breakers and retries
+CIRCUIT_STATE = Gauge(
+    "agent_circuit_state",
+    "Circuit breaker state per target (0=closed, 1=half_open, 2=open)",
+    ["target"],
+)
+
+CIRCUIT_TRANSITIONS = Counter(
+    "agent_circuit_transitions_total",
+    "Circuit breaker state transitions by new state",
+    ["target", "state"],
+)
+
+CIRCUIT_REJECTIONS = Counter(
+    "agent_circuit_rejections_total",
+    "Calls rejected without reaching the target because its breaker is open",
+    ["target"],
+)
+
+RETRIES_TOTAL = Counter(
+    "agent_retries_total",
+    "Retry decisions for failed inter-service calls",
+    ["target", "result"],
+)
+
+# Manager request hedging
+HEDGES_TOTAL = Counter(
+    "agent_hedges_total",
+    "Hedged requests: issued, won (hedge finished first) or capped by the hedge budget",
+    ["target", "result"],
+)
+
+HEDGE_DELAY = Histogram(
+    "agent_hedge_delay_seconds",
+    "Latency percentile used as the hedge trigger when a hedge was issued",
+    ["target"],
+    buckets=[0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0],
+)
+
+# Manager client-side load balancing
+LB_ENDPOINTS = Gauge(
+    "agent_lb_healthy_endpoints",
+    "Endpoints currently eligible for selection",
+    ["target"],
+)
+
+LB_ENDPOINT_IN_FLIGHT = Gauge(
+    "agent_lb_endpoint_in_flight",
+    "Outstanding requests per endpoint",
+    ["target", "endpoint"],
+)
+
+LB_ENDPOINT_LATENCY = Histogram(
+    "agent_lb_endpoint_duration_seconds",
+    "Successful call latency per endpoint",
+    ["target", "endpoint"],
+    buckets=[0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0],
+)
+
+LB_EJECTIONS = Counter(
+    "agent_lb_ejections_total",
+    "Passive health ejections per endpoint",
+    ["target", "endpoint"],
+)
+
+# Manager admission control
+ADMISSION_IN_FLIGHT = Gauge(
+    "agent_admission_in_flight",
+    "Admitted requests currently running",
+    ["task_type"],
+)
+
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "agent_admission_queue_depth",
+    "Requests waiting for an admission slot",
+)
+
+ADMISSION_QUEUE_WAIT = Histogram(
+    "agent_admission_queue_wait_seconds",
+    "Time admitted requests spent waiting for a slot",
+    ["task_type"],
+    buckets=[0.0, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0],
+)
+
+ADMISSION_REJECTED = Counter(
+    "agent_admission_rejected_total",
+    "Requests shed by admission control",
+    ["task_type", "reason"],
+)
+
+# Tracing
+TRACE_SPANS = Counter(
+    "agent_trace_spans_total",
+    "Finished spans by export outcome",
+    ["result"],
+)
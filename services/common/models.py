@@ -40,6 +40,19 @@ class ExecutionLog(Base):
     prompt_version = Column(Integer, nullable=True)
     worker_output = Column(Text, nullable=True)
     worker_latency_ms = Column(Integer, nullable=True)
+    # Per-stage timings measured by the manager (rule_validation_ms as reported by the evaluator)
+    refine_latency_ms = Column(Integer, nullable=True)
+    worker_roundtrip_ms = Column(Integer, nullable=True)
+    evaluator_roundtrip_ms = Column(Integer, nullable=True)
+    rule_validation_ms = Column(Integer, nullable=True)
+    total_latency_ms = Column(Integer, nullable=True)
+    # Billed LLM usage: totals over refine, worker and judge calls; worker_* is the share
+    # attributable to prompt_version
+    input_tokens = Column(Integer, nullable=True)
+    output_tokens = Column(Integer, nullable=True)
+    worker_input_tokens = Column(Integer, nullable=True)
+    worker_output_tokens = Column(Integer, nullable=True)
+    llm_cost_usd = Column(Float, nullable=True)
     evaluation_score = Column(Float, nullable=True)
     evaluation_passed = Column(Boolean, nullable=True)
     evaluation_detail = Column(JSON, nullable=True)
@@ -60,6 +73,9 @@ class OptimizationReport(Base):
     before_prompt_content = Column(Text, nullable=False)
     after_prompt_version = Column(Integer, nullable=False)
     after_prompt_content = Column(Text, nullable=False)
+    # Estimated prompt lengths, to catch patches that bloat the prompt
+    before_prompt_tokens = Column(Integer, nullable=True)
+    after_prompt_tokens = Column(Integer, nullable=True)
     failure_analysis = Column(JSON, nullable=True)
     improvement_pct = Column(Float, nullable=True)
     triggered_by = Column(String(64), nullable=False, default="cronjob")
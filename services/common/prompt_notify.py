@@ -0,0 +1,56 @@
+import asyncio
+from typing import Callable, Optional
+
+import asyncpg
+
+from services.common.config import get_settings
+from services.common.db import get_asyncpg_dsn
+from services.common.logging_utils import setup_logger
+
+logger = setup_logger("common.prompt_notify")
+
+RECONNECT_DELAY_SECONDS = 5.0
+
+
+async def listen_prompt_channel(stop: asyncio.Event, on_change: Callable[[Optional[str], str], None]) -> None:
+    """LISTEN on the prompt channel until stopped, calling ``on_change(task_type, reason)``.
+
+    ``patch_prompt`` publishes the task_type as payload. Uses a dedicated
+    asyncpg connection so it never occupies a slot in the SQLAlchemy pool.
+    After every (re)connect ``on_change(None, "reconnect")`` is called since
+    notifications may have been missed; caches should rely on their TTL
+    while disconnected.
+    """
+    channel = get_settings().PROMPT_NOTIFY_CHANNEL
+
+    def on_notify(connection, pid, channel_name, payload):
+        on_change(payload or None, "notify")
+
+    while not stop.is_set():
+        conn = None
+        try:
+            conn = await asyncpg.connect(get_asyncpg_dsn())
+            await conn.add_listener(channel, on_notify)
+            on_change(None, "reconnect")
+            logger.info("prompt_listener_started", extra={"channel": channel})
+
+            lost = asyncio.Event()
+            conn.add_termination_listener(lambda _conn: lost.set())
+            stop_wait = asyncio.create_task(stop.wait())
+            lost_wait = asyncio.create_task(lost.wait())
+            await asyncio.wait({stop_wait, lost_wait}, return_when=asyncio.FIRST_COMPLETED)
+            stop_wait.cancel()
+            lost_wait.cancel()
+        except Exception as e:
+            logger.warning("prompt_listener_error", extra={"channel": channel, "error": str(e)})
+        finally:
+            if conn is not None and not conn.is_closed():
+                await conn.close()
+
+        if not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=RECONNECT_DELAY_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    logger.info("prompt_listener_stopped", extra={"channel": channel})
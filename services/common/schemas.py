@@ -5,6 +5,14 @@ from uuid import UUID
 from pydantic import BaseModel, Field
 
 
+# --- Shared ---
+class TokenUsage(BaseModel):
+    """Billed LLM tokens and their estimated cost; LLM response-cache hits count as zero."""
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost_usd: float = 0.0
+
+
 # --- Manager ---
 class RequestInput(BaseModel):
     user_input: str = Field(..., min_length=1, description="User's raw request")
@@ -15,9 +23,50 @@ class RequestResponse(BaseModel):
     request_id: UUID
     refined_input: str
     worker_output: str
-    evaluation_score: float
-    evaluation_passed: bool
+    # None while evaluation_status is "pending" (deferred evaluation mode)
+    evaluation_score: Optional[float] = None
+    evaluation_passed: Optional[bool] = None
+    evaluation_status: str = "completed"
     prompt_version: int
+    cached: bool = False
+
+
+class JobAccepted(BaseModel):
+    request_id: UUID
+    status: str
+
+
+class RequestStatusResponse(BaseModel):
+    request_id: UUID
+    status: str = Field(description="pending | running | completed | failed")
+    refined_input: Optional[str] = None
+    worker_output: Optional[str] = None
+    evaluation_score: Optional[float] = None
+    evaluation_passed: Optional[bool] = None
+    evaluation_status: Optional[str] = Field(default=None, description="pending | completed | failed")
+    prompt_version: Optional[int] = None
+    cached: Optional[bool] = None
+    error_message: Optional[str] = None
+
+
+class BatchRequestInput(BaseModel):
+    items: list[RequestInput] = Field(..., min_length=1)
+    concurrency: Optional[int] = Field(default=None, ge=1, description="Max items in flight")
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    request_id: UUID
+    status: str
+    result: Optional[RequestResponse] = None
+    error: Optional[str] = None
+
+
+class BatchResponse(BaseModel):
+    total: int
+    succeeded: int
+    failed: int
+    results: list[BatchItemResult]
 
 
 # --- Worker ---
@@ -32,6 +81,17 @@ class TaskOutput(BaseModel):
     output: str
     prompt_version: int
     latency_ms: int
+    usage: TokenUsage = Field(default_factory=TokenUsage)
+
+
+class FusedTaskInput(BaseModel):
+    request_id: UUID
+    task_type: str = "code_generation"
+    user_input: str
+
+
+class FusedTaskOutput(TaskOutput):
+    refined_input: str
 
 
 # --- Evaluator ---
@@ -48,6 +108,10 @@ class EvaluationDetail(BaseModel):
     llm_score: float = Field(ge=0, le=1)
     rule_details: dict = {}
     llm_details: dict = {}
+    # Degraded-mode fallbacks taken under the request deadline, e.g. "judge_deadline"
+    fallbacks: list[str] = []
+    rule_latency_ms: Optional[int] = None
+    judge_latency_ms: Optional[int] = None
 
 
 class EvaluateOutput(BaseModel):
@@ -55,6 +119,8 @@ class EvaluateOutput(BaseModel):
     score: float
     passed: bool
     detail: EvaluationDetail
+    # LLM judge usage
+    usage: TokenUsage = Field(default_factory=TokenUsage)
 
 
 # --- Optimizer ---
@@ -0,0 +1,444 @@
+import asyncio
+import json
+import os
+import random
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, MutableMapping, Optional
+
+import httpx
+from sqlalchemy import event
+
+from services.common.config import get_settings
+from services.common.logging_utils import setup_logger
+from services.common.metrics import TRACE_SPANS
+
+logger = setup_logger("common.tracing")
+
+# W3C Trace Context header: version-trace_id-span_id-flags
+TRACEPARENT_HEADER = "traceparent"
+
+KIND_INTERNAL = "internal"
+KIND_SERVER = "server"
+KIND_CLIENT = "client"
+
+# OTLP enum values
+_OTLP_KINDS = {KIND_INTERNAL: 1, KIND_SERVER: 2, KIND_CLIENT: 3}
+_OTLP_STATUS_OK = 1
+_OTLP_STATUS_ERROR = 2
+
+EXPORTER_NONE = "none"
+EXPORTER_JSONL = "jsonl"
+EXPORTER_OTLP = "otlp"
+
+# Probe and scrape endpoints would drown out real traffic
+_UNTRACED_PATHS = ("/health", "/ready", "/metrics")
+
+# Cap on exported SQL text per span
+_MAX_STATEMENT_LENGTH = 500
+
+
+@dataclass
+class Span:
+    name: str
+    service: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    sampled: bool
+    kind: str = KIND_INTERNAL
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int = 0
+    attributes: dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+@dataclass
+class _RemoteParent:
+    trace_id: str
+    span_id: str
+    sampled: bool
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+_request_id: ContextVar[Optional[str]] = ContextVar("trace_request_id", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def set_request_id(request_id) -> None:
+    """Tag the current span, its later children and metric exemplars with the pipeline request_id."""
+    _request_id.set(str(request_id))
+    span = _current_span.get()
+    if span is not None:
+        span.set_attribute("request_id", str(request_id))
+
+
+def exemplar() -> Optional[dict[str, str]]:
+    """Exemplar labels linking a histogram observation to its trace, or None outside a sampled span."""
+    span = _current_span.get()
+    if span is None or not span.sampled:
+        return None
+    labels = {"trace_id": span.trace_id}
+    request_id = _request_id.get()
+    if request_id:
+        labels["request_id"] = request_id
+    return labels
+
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+def parse_traceparent(value: str) -> Optional[_RemoteParent]:
+    parts = value.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        flags = int(parts[3][:2], 16)
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return _RemoteParent(trace_id=parts[1], span_id=parts[2], sampled=bool(flags & 1))
+
+
+def inject(headers: MutableMapping[str, str]) -> None:
+    """Add the current span's traceparent to outgoing request headers."""
+    span = _current_span.get()
+    if span is not None:
+        headers[TRACEPARENT_HEADER] = span.traceparent()
+
+
+def _start(name: str, kind: str, parent, service: Optional[str], attributes: dict) -> Span:
+    if parent is None:
+        trace_id, parent_id = _new_id(16), None
+        sampled = random.random() < get_settings().TRACING_SAMPLE_RATIO
+    else:
+        trace_id, parent_id, sampled = parent.trace_id, parent.span_id, parent.sampled
+    # Local children inherit the service; a remote parent belongs to the caller's
+    service = service or (parent.service if isinstance(parent, Span) else "unknown")
+    span = Span(name, service, trace_id, _new_id(8), parent_id, sampled, kind=kind, attributes=dict(attributes))
+    request_id = _request_id.get()
+    if request_id:
+        span.attributes.setdefault("request_id", request_id)
+    return span
+
+
+def _finish(span: Span, exc: Optional[BaseException]) -> None:
+    span.end_ns = time.time_ns()
+    if exc is not None and span.error is None:
+        span.error = f"{type(exc).__name__}: {exc}"
+    if span.sampled:
+        get_exporter().submit(span)
+
+
+class span:
+    """Open a child span of the current one (or a new trace) for the enclosed block.
+
+    Like ``stage``, a sync context manager that also works inside coroutines.
+    Spans are recorded with an error status if the block raises.
+    """
+
+    def __init__(
+        self, name: str, kind: str = KIND_INTERNAL, parent=None, service: Optional[str] = None, **attributes: Any,
+    ):
+        self.name = name
+        self.kind = kind
+        self.parent = parent
+        self.service = service
+        self.attributes = attributes
+
+    def __enter__(self) -> Span:
+        parent = self.parent or _current_span.get()
+        self._span = _start(self.name, self.kind, parent, self.service, self.attributes)
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # Exited from another context (e.g. a stream closed by a different task)
+            pass
+        _finish(self._span, exc)
+
+
+def record_span(name: str, start_ns: int, kind: str = KIND_INTERNAL, error: Optional[str] = None, **attributes: Any) -> None:
+    """Record an already-finished child of the current span (for event hooks that can't wrap a block)."""
+    recorded = _start(name, kind, _current_span.get(), None, attributes)
+    recorded.start_ns = start_ns
+    recorded.error = error
+    _finish(recorded, None)
+
+
+class SpanExporter:
+    """Buffers finished spans and writes them out in batches from a background task.
+
+    ``jsonl`` appends one span per line to a local file, so traces work
+    offline. ``otlp`` posts OTLP/JSON to a collector's /v1/traces endpoint.
+    When the buffer is full, new spans are dropped rather than slowing
+    requests down.
+    """
+
+    def __init__(self, exporter: str, max_queue: int, batch_size: int, interval: float):
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.interval = interval
+        self._buffer: deque[Span] = deque()
+        self._max_queue = max_queue
+        self._task: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._wakeup = asyncio.Event()
+        self._closing = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter != EXPORTER_NONE
+
+    def submit(self, finished: Span) -> None:
+        if not self.enabled:
+            return
+        if len(self._buffer) >= self._max_queue:
+            TRACE_SPANS.labels(result="dropped").inc()
+            return
+        self._buffer.append(finished)
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        if not self.enabled or self._task is not None:
+            return
+        if self.exporter == EXPORTER_OTLP:
+            self._client = httpx.AsyncClient(timeout=5.0)
+        self._closing = False
+        self._task = asyncio.create_task(self._run(), name="span-exporter")
+        logger.info("tracing_started", extra={"exporter": self.exporter})
+
+    async def stop(self) -> None:
+        """Flush what is buffered and stop the background task."""
+        if self._task is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+        await self.flush()
+
+    async def flush(self) -> None:
+        while self._buffer:
+            batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            try:
+                if self.exporter == EXPORTER_JSONL:
+                    await asyncio.to_thread(self._write_jsonl, batch)
+                else:
+                    await self._post_otlp(batch)
+            except Exception as e:
+                TRACE_SPANS.labels(result="failed").inc(len(batch))
+                logger.warning("trace_export_failed", extra={"count": len(batch), "error": str(e)})
+                continue
+            TRACE_SPANS.labels(result="exported").inc(len(batch))
+
+    def _write_jsonl(self, batch: list[Span]) -> None:
+        with open(get_settings().TRACING_JSONL_PATH, "a", encoding="utf-8") as f:
+            for s in batch:
+                f.write(json.dumps({
+                    "service": s.service,
+                    "trace_id": s.trace_id,
+                    "span_id": s.span_id,
+                    "parent_span_id": s.parent_id,
+                    "name": s.name,
+                    "kind": s.kind,
+                    "start_time_unix_nano": s.start_ns,
+                    "end_time_unix_nano": s.end_ns,
+                    "duration_ms": round((s.end_ns - s.start_ns) / 1e6, 3),
+                    "status": "error" if s.error else "ok",
+                    "error": s.error,
+                    "attributes": s.attributes,
+                }, default=str) + "\n")
+
+    async def _post_otlp(self, batch: list[Span]) -> None:
+        response = await self._client.post(get_settings().TRACING_OTLP_ENDPOINT, json=self._otlp_payload(batch))
+        response.raise_for_status()
+
+    def _otlp_payload(self, batch: list[Span]) -> dict:
+        by_service: dict[str, list[Span]] = {}
+        for s in batch:
+            by_service.setdefault(s.service, []).append(s)
+        return {"resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": service})},
+            "scopeSpans": [{
+                "scope": {"name": "agent-system"},
+                "spans": [{
+                    "traceId": s.trace_id,
+                    "spanId": s.span_id,
+                    **({"parentSpanId": s.parent_id} if s.parent_id else {}),
+                    "name": s.name,
+                    "kind": _OTLP_KINDS[s.kind],
+                    "startTimeUnixNano": str(s.start_ns),
+                    "endTimeUnixNano": str(s.end_ns),
+                    "attributes": _otlp_attributes(s.attributes),
+                    "status": (
+                        {"code": _OTLP_STATUS_ERROR, "message": s.error} if s.error else {"code": _OTLP_STATUS_OK}
+                    ),
+                } for s in spans],
+            }],
+        } for service, spans in by_service.items()]}
+
+
+def _otlp_attributes(attributes: dict[str, Any]) -> list[dict]:
+    encoded = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            typed = {"boolValue": value}
+        elif isinstance(value, int):
+            typed = {"intValue": str(value)}
+        elif isinstance(value, float):
+            typed = {"doubleValue": value}
+        else:
+            typed = {"stringValue": str(value)}
+        encoded.append({"key": key, "value": typed})
+    return encoded
+
+
+_exporter: Optional[SpanExporter] = None
+
+
+def get_exporter() -> SpanExporter:
+    global _exporter
+    if _exporter is None:
+        settings = get_settings()
+        _exporter = SpanExporter(
+            settings.TRACING_EXPORTER,
+            max_queue=settings.TRACING_MAX_QUEUE,
+            batch_size=settings.TRACING_EXPORT_BATCH_SIZE,
+            interval=settings.TRACING_EXPORT_INTERVAL_SECONDS,
+        )
+    return _exporter
+
+
+class TracingTransport(httpx.AsyncBaseTransport):
+    """httpx transport wrapper: a client span per request, with traceparent injected.
+
+    The span ends when response headers arrive; a streamed body is not included.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        with span(
+            f"HTTP {request.method} {request.url.path}", kind=KIND_CLIENT,
+            **{"http.method": request.method, "http.url": str(request.url)},
+        ) as client_span:
+            inject(request.headers)
+            response = await self._transport.handle_async_request(request)
+            client_span.set_attribute("http.status_code", response.status_code)
+            if response.status_code >= 500:
+                client_span.error = f"HTTP {response.status_code}"
+            return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def _route_template(scope) -> Optional[str]:
+    """Matched route path with the router prefix, e.g. "/api/v1/request/{request_id}"."""
+    # Newer FastAPI keeps included routes unprefixed and records the effective path separately
+    effective = scope.get("fastapi", {}).get("effective_route_context")
+    if effective is not None and getattr(effective, "path", None):
+        return effective.path
+    return getattr(scope.get("route"), "path", None)
+
+
+class TracingMiddleware:
+    """ASGI middleware: a server span per HTTP request, continuing the caller's traceparent."""
+
+    def __init__(self, app, service: str):
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(_UNTRACED_PATHS):
+            return await self.app(scope, receive, send)
+        parent = None
+        header = TRACEPARENT_HEADER.encode("latin-1")
+        for name, value in scope.get("headers", []):
+            if name == header:
+                parent = parse_traceparent(value.decode("latin-1"))
+                break
+
+        status = {}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        with span(
+            f"{scope['method']} {scope['path']}", kind=KIND_SERVER, parent=parent, service=self.service,
+        ) as server_span:
+            server_span.set_attribute("http.method", scope["method"])
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                # Name by route template once routing has matched, to keep span names low-cardinality
+                route = _route_template(scope)
+                if route:
+                    server_span.name = f"{scope['method']} {route}"
+                    server_span.set_attribute("http.route", route)
+                if "code" in status:
+                    server_span.set_attribute("http.status_code", status["code"])
+                    if status["code"] >= 500:
+                        server_span.error = f"HTTP {status['code']}"
+
+
+def instrument_engine(engine) -> None:
+    """Record a span for every SQL statement run on `engine` (an AsyncEngine)."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("trace_start_ns", []).append(time.time_ns())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("trace_start_ns")
+        if starts:
+            record_span(
+                "db.query", starts.pop(), kind=KIND_CLIENT,
+                **{"db.system": "postgresql", "db.statement": statement[:_MAX_STATEMENT_LENGTH]},
+            )
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context):
+        starts = context.connection.info.get("trace_start_ns") if context.connection is not None else None
+        if starts:
+            record_span(
+                "db.query", starts.pop(), kind=KIND_CLIENT,
+                error=f"{type(context.original_exception).__name__}: {context.original_exception}",
+                **{"db.system": "postgresql", "db.statement": (context.statement or "")[:_MAX_STATEMENT_LENGTH]},
+            )
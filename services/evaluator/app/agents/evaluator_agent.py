@@ -4,7 +4,8 @@ import re
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
-from services.common.llm_provider import get_llm
+from services.common.instrumentation import stage
+from services.common.llm_provider import get_llm, get_chain
 from services.common.logging_utils import setup_logger
 
 logger = setup_logger("evaluator.agent")
@@ -20,7 +21,7 @@ Respond in EXACTLY this JSON format (no extra text):
 {{"relevance": <0-10>, "quality": <0-10>, "safety": <0-10>, "reasoning": "<brief explanation>"}}"""
 
 
-def build_evaluator_chain():
+def _compile_evaluator_chain():
     llm = get_llm(temperature=0.1)
     prompt = ChatPromptTemplate.from_messages([
         ("system", EVALUATOR_SYSTEM_PROMPT),
@@ -29,6 +30,11 @@ def build_evaluator_chain():
     return prompt | llm | StrOutputParser()
 
 
+def build_evaluator_chain():
+    return get_chain("evaluator", EVALUATOR_SYSTEM_PROMPT, _compile_evaluator_chain)
+
+
+@stage("evaluator", "llm")
 async def evaluate_with_llm(user_input: str, refined_input: str, worker_output: str) -> dict:
     """LLM-based evaluation. Returns {score: 0-1, details: {...}}."""
     chain = build_evaluator_chain()
@@ -3,6 +3,8 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from prometheus_client import make_asgi_app
 
+from services.common.deadline import DeadlineMiddleware
+from services.common.tracing import TracingMiddleware, get_exporter
 from services.evaluator.app.routes.health import router as health_router
 from services.evaluator.app.routes.evaluate import router as evaluate_router
 
@@ -11,10 +13,15 @@ from services.evaluator.app.routes.stats import router as stats_router
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    get_exporter().start()
     yield
+    await get_exporter().stop()
 
 
 app = FastAPI(title="Evaluator Service", version="1.0.0", lifespan=lifespan)
+# Deadline comes from the caller's header only
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(TracingMiddleware, service="evaluator")
 
 metrics_app = make_asgi_app()
 app.mount("/metrics", metrics_app)
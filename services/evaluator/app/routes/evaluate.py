@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException
 
 from services.common.logging_utils import setup_logger
 from services.common.schemas import EvaluateInput, EvaluateOutput, EvaluationDetail
+from services.common.tracing import set_request_id
 from services.evaluator.app.services.scorer import compute_score
 
 logger = setup_logger("evaluator.evaluate")
@@ -10,10 +11,11 @@ router = APIRouter()
 
 @router.post("/evaluate", response_model=EvaluateOutput)
 async def handle_evaluate(body: EvaluateInput):
+    set_request_id(body.request_id)
     logger.info("evaluate_received", extra={"request_id": str(body.request_id)})
 
     try:
-        score, passed, detail = await compute_score(
+        score, passed, detail, usage = await compute_score(
             task_type=body.task_type,
             user_input=body.user_input,
             refined_input=body.refined_input,
@@ -31,4 +33,5 @@ async def handle_evaluate(body: EvaluateInput):
         score=score,
         passed=passed,
         detail=EvaluationDetail(**detail),
+        usage=usage,
     )
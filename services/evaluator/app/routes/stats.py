@@ -4,13 +4,24 @@ from datetime import datetime, timedelta
 from fastapi import APIRouter, Query
 from sqlalchemy import select, func, and_, desc
 
-from services.common.db import get_db
+from services.common.db import db_session
 from services.common.models import ExecutionLog
 from services.common.logging_utils import setup_logger
 
 logger = setup_logger("evaluator.stats")
 router = APIRouter()
 
+# Stage name -> ExecutionLog timing column, in pipeline order
+STAGE_COLUMNS = {
+    "refine": ExecutionLog.refine_latency_ms,
+    "worker_roundtrip": ExecutionLog.worker_roundtrip_ms,
+    "worker_llm": ExecutionLog.worker_latency_ms,
+    "evaluator_roundtrip": ExecutionLog.evaluator_roundtrip_ms,
+    "rule_validation": ExecutionLog.rule_validation_ms,
+    "total": ExecutionLog.total_latency_ms,
+}
+PERCENTILES = (0.5, 0.95, 0.99)
+
 
 @router.get("/stats/summary")
 async def get_evaluation_summary(
@@ -18,7 +29,7 @@ async def get_evaluation_summary(
     task_type: Optional[str] = Query(default=None, description="Filter by task type"),
 ):
     """평가 지표 요약 정보 조회"""
-    async with get_db() as db:
+    async with db_session() as db:
         # 시간 범위 설정
         time_threshold = datetime.utcnow() - timedelta(hours=hours)
 
@@ -78,7 +89,7 @@ async def get_stats_by_task_type(
     hours: int = Query(default=24, ge=1, le=168, description="Time range in hours"),
 ):
     """Task Type별 평가 지표"""
-    async with get_db() as db:
+    async with db_session() as db:
         time_threshold = datetime.utcnow() - timedelta(hours=hours)
 
         query = select(
@@ -113,13 +124,52 @@ async def get_stats_by_task_type(
         return {"time_range_hours": hours, "stats": stats}
 
 
+@router.get("/stats/stage-latency")
+async def get_stage_latency(
+    hours: int = Query(default=24, ge=1, le=168, description="Time range in hours"),
+    task_type: Optional[str] = Query(default=None, description="Filter by task type"),
+):
+    """단계별 레이턴시 p50/p95/p99 (ms)"""
+    async with db_session() as db:
+        time_threshold = datetime.utcnow() - timedelta(hours=hours)
+
+        filters = [ExecutionLog.created_at >= time_threshold]
+        if task_type:
+            filters.append(ExecutionLog.task_type == task_type)
+
+        # percentile_cont skips NULLs, so each stage only counts rows where it ran
+        columns = []
+        for stage, column in STAGE_COLUMNS.items():
+            columns.append(func.count(column).label(f"{stage}_count"))
+            for q in PERCENTILES:
+                columns.append(
+                    func.percentile_cont(q).within_group(column.asc()).label(f"{stage}_p{int(q * 100)}")
+                )
+
+        row = (await db.execute(select(*columns).where(and_(*filters)))).one()
+
+        stages = {}
+        for stage in STAGE_COLUMNS:
+            stages[stage] = {"count": getattr(row, f"{stage}_count") or 0}
+            for q in PERCENTILES:
+                key = f"p{int(q * 100)}"
+                value = getattr(row, f"{stage}_{key}")
+                stages[stage][key] = round(float(value), 2) if value is not None else None
+
+        return {
+            "time_range_hours": hours,
+            "task_type": task_type,
+            "stages": stages,
+        }
+
+
 @router.get("/stats/score-distribution")
 async def get_score_distribution(
     hours: int = Query(default=24, ge=1, le=168, description="Time range in hours"),
     task_type: Optional[str] = Query(default=None, description="Filter by task type"),
 ):
     """평가 점수 분포"""
-    async with get_db() as db:
+    async with db_session() as db:
         time_threshold = datetime.utcnow() - timedelta(hours=hours)
 
         filters = [
@@ -166,7 +216,7 @@ async def get_recent_failures(
     task_type: Optional[str] = Query(default=None, description="Filter by task type"),
 ):
     """최근 실패 케이스 조회"""
-    async with get_db() as db:
+    async with db_session() as db:
         filters = [ExecutionLog.evaluation_passed == False]
         if task_type:
             filters.append(ExecutionLog.task_type == task_type)
@@ -204,7 +254,7 @@ async def get_prompt_performance(
     task_type: Optional[str] = Query(default=None, description="Filter by task type"),
 ):
     """프롬프트 버전별 성능 비교"""
-    async with get_db() as db:
+    async with db_session() as db:
         time_threshold = datetime.utcnow() - timedelta(hours=hours)
 
         filters = [
@@ -221,6 +271,9 @@ async def get_prompt_performance(
             func.count().filter(ExecutionLog.evaluation_passed == True).label("pass_count"),
             func.avg(ExecutionLog.evaluation_score).label("avg_score"),
             func.avg(ExecutionLog.worker_latency_ms).label("avg_latency"),
+            func.avg(ExecutionLog.worker_input_tokens).label("avg_worker_input_tokens"),
+            func.avg(ExecutionLog.worker_output_tokens).label("avg_worker_output_tokens"),
+            func.sum(ExecutionLog.llm_cost_usd).label("total_cost_usd"),
         ).where(
             and_(*filters)
         ).group_by(
@@ -246,6 +299,9 @@ async def get_prompt_performance(
                 "pass_rate": round(pass_count / total, 4) if total > 0 else 0,
                 "avg_score": round(float(row.avg_score or 0), 4),
                 "avg_latency_ms": round(float(row.avg_latency or 0), 2),
+                "avg_worker_input_tokens": round(float(row.avg_worker_input_tokens or 0), 1),
+                "avg_worker_output_tokens": round(float(row.avg_worker_output_tokens or 0), 1),
+                "total_cost_usd": round(float(row.total_cost_usd or 0), 6),
             })
 
         return {
@@ -1,5 +1,11 @@
+import time
+
+from services.common.config import get_settings
+from services.common.deadline import DeadlineExceeded, record_fallback, with_deadline
+from services.common.instrumentation import stage, track_usage
 from services.common.logging_utils import setup_logger
 from services.common.metrics import EVALUATION_SCORE, EVALUATION_PASS_TOTAL
+from services.common.schemas import TokenUsage
 from services.evaluator.app.agents.evaluator_agent import evaluate_with_llm
 from services.evaluator.app.services.validators import validate_output
 
@@ -15,20 +21,41 @@ async def compute_score(
     user_input: str,
     refined_input: str,
     worker_output: str,
-) -> tuple[float, bool, dict]:
-    """Compute combined score. Returns (score, passed, detail_dict)."""
+) -> tuple[float, bool, dict, TokenUsage]:
+    """Compute combined score. Returns (score, passed, detail_dict, judge token usage)."""
 
     # Rule-based validation (40%)
-    rule_result = validate_output(worker_output, task_type)
+    start = time.perf_counter()
+    with stage("evaluator", "rule_validation"):
+        rule_result = validate_output(worker_output, task_type)
+    rule_latency_ms = int((time.perf_counter() - start) * 1000)
 
-    # LLM-based evaluation (60%)
-    llm_result = await evaluate_with_llm(user_input, refined_input, worker_output)
+    # LLM-based evaluation (60%), bounded by the request deadline
+    fallbacks = []
+    start = time.perf_counter()
+    try:
+        with track_usage(task_type) as usage:
+            llm_result = await with_deadline(
+                evaluate_with_llm(user_input, refined_input, worker_output),
+                share=get_settings().JUDGE_DEADLINE_SHARE,
+            )
+    except DeadlineExceeded:
+        llm_result = None
+        fallbacks.append("judge_deadline")
+        record_fallback("evaluator", "judge")
+        logger.warning("judge_deadline_fallback", extra={"task_type": task_type})
+    judge_latency_ms = int((time.perf_counter() - start) * 1000)
 
-    # Weighted combination
-    combined_score = round(
-        rule_result["score"] * RULE_WEIGHT + llm_result["score"] * LLM_WEIGHT,
-        3,
-    )
+    if llm_result is not None:
+        # Weighted combination
+        combined_score = round(
+            rule_result["score"] * RULE_WEIGHT + llm_result["score"] * LLM_WEIGHT,
+            3,
+        )
+    else:
+        # Late judge: score on the rules alone
+        combined_score = round(rule_result["score"], 3)
+        llm_result = {"score": 0.0, "details": {"skipped": "deadline"}}
     passed = combined_score >= PASS_THRESHOLD
 
     # Record metrics
@@ -43,6 +70,9 @@ async def compute_score(
         "llm_score": llm_result["score"],
         "rule_details": rule_result["details"],
         "llm_details": llm_result["details"],
+        "fallbacks": fallbacks,
+        "rule_latency_ms": rule_latency_ms,
+        "judge_latency_ms": judge_latency_ms,
     }
 
     logger.info("score_computed", extra={
@@ -53,4 +83,4 @@ async def compute_score(
         "passed": passed,
     })
 
-    return combined_score, passed, detail
+    return combined_score, passed, detail, usage
@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
@@ -5,14 +6,63 @@ from prometheus_client import make_asgi_app
 
 from services.manager.app.routes.health import router as health_router
 from services.manager.app.routes.request import router as request_router
+from services.common.config import get_settings
+from services.common.deadline import DeadlineMiddleware, default_deadline_seconds
+from services.common.log_sink import get_log_sink
+from services.common.tracing import TracingMiddleware, get_exporter
+from services.manager.app.services.evaluation_queue import get_evaluation_queue
+from services.manager.app.services.http_clients import init_clients, close_clients
+from services.manager.app.services.jobs import get_job_executor
+from services.manager.app.services.load_balancer import run_endpoint_refresh
+from services.manager.app.services.prompt_versions import listen_for_prompt_changes
+from services.manager.app.services.refine_index import warm_up_refine_index
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    settings = get_settings()
+    get_exporter().start()
+    init_clients()
+    sink = get_log_sink()
+    if settings.LOG_SINK_ENABLED:
+        sink.start()
+    evaluations = get_evaluation_queue()
+    if settings.EVALUATION_MODE == "deferred":
+        evaluations.start()
+    executor = get_job_executor()
+    executor.start()
+    stop = asyncio.Event()
+    prompt_listener = asyncio.create_task(listen_for_prompt_changes(stop))
+    endpoint_refresh = asyncio.create_task(run_endpoint_refresh(stop))
+    warm_up = None
+    if settings.REFINE_INDEX_ENABLED and settings.REFINE_INDEX_WARM_UP:
+        warm_up = asyncio.create_task(warm_up_refine_index())
     yield
+    if warm_up is not None and not warm_up.done():
+        warm_up.cancel()
+    stop.set()
+    await prompt_listener
+    await endpoint_refresh
+    await executor.stop(settings.JOB_DRAIN_TIMEOUT_SECONDS)
+    # Drained jobs may queue evaluations; those update rows, so the sink stops last
+    if evaluations.running:
+        await evaluations.stop(settings.EVAL_DRAIN_TIMEOUT_SECONDS)
+    # After the executor so rows from drained jobs are flushed too
+    await sink.stop()
+    await close_clients()
+    await get_exporter().stop()
 
 
 app = FastAPI(title="Manager Service", version="1.0.0", lifespan=lifespan)
+# Public entry point: clamp client-supplied budgets (internal hops trust the header as is)
+app.add_middleware(
+    DeadlineMiddleware,
+    default_seconds=default_deadline_seconds(),
+    min_seconds=get_settings().REQUEST_DEADLINE_MIN_SECONDS,
+    max_seconds=get_settings().REQUEST_DEADLINE_MAX_SECONDS,
+)
+# Added last so it runs outermost and its span covers the whole request
+app.add_middleware(TracingMiddleware, service="manager")
 
 # Prometheus metrics endpoint
 metrics_app = make_asgi_app()
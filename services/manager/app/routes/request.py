@@ -1,107 +1,211 @@
+import asyncio
+import json
+import math
 import time
 import uuid
+from contextlib import AsyncExitStack
+from typing import Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
+from services.common.config import get_settings
 from services.common.db import get_db
 from services.common.logging_utils import setup_logger
-from services.common.metrics import REQUEST_COUNT, REQUEST_LATENCY
-from services.common.schemas import RequestInput, RequestResponse
-from services.manager.app.services.refiner import refine_request
-from services.manager.app.services.router import call_worker, call_evaluator
+from services.common.metrics import REQUEST_LATENCY
+from services.common.tracing import exemplar, set_request_id
+from services.common.schemas import (
+    RequestInput, RequestResponse, JobAccepted, RequestStatusResponse, BatchRequestInput, BatchResponse,
+)
+from services.manager.app.services.admission import AdmissionRejected, admission
+from services.manager.app.services.batch import run_batch
+from services.manager.app.services.idempotency import (
+    IDEMPOTENCY_HEADER, MAX_KEY_LENGTH, REPLAYED_HEADER, IdempotencyKeyReused, fingerprint, get_idempotency_store,
+)
+from services.manager.app.services.jobs import (
+    PENDING, COMPLETED, FAILED, QueueFullError, get_job_executor,
+)
+from services.manager.app.services.pipeline import run_pipeline, stream_pipeline
+from services.manager.app.services.resilience import CircuitOpenError
 
 logger = setup_logger("manager.request")
 router = APIRouter()
 
 
-@router.post("/request", response_model=RequestResponse)
+def _shed(e: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=e.status_code, detail=str(e), headers={"Retry-After": str(max(math.ceil(e.retry_after), 1))},
+    )
+
+
+class _AdmittedStreamingResponse(StreamingResponse):
+    """StreamingResponse that releases its admission slot however the response ends.
+
+    The body generator's own cleanup never runs if the client disconnects
+    before the first chunk is pulled, so the slot is closed around the whole
+    ASGI call instead. AsyncExitStack.aclose() is idempotent.
+    """
+
+    def __init__(self, content, slot: AsyncExitStack, **kwargs):
+        super().__init__(content, **kwargs)
+        self.slot = slot
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.slot.aclose()
+
+
+@router.post(
+    "/request",
+    response_model=RequestResponse,
+    responses={202: {"model": JobAccepted, "description": "Accepted for async processing"}},
+)
 async def handle_request(
     body: RequestInput,
-    db: AsyncSession = Depends(get_db),
+    response: Response,
+    mode: Literal["sync", "async"] = Query(
+        default="sync",
+        description="sync: wait for the full pipeline; async: return 202 and poll GET /request/{request_id}",
+    ),
+    idempotency_key: Optional[str] = Header(
+        default=None,
+        alias=IDEMPOTENCY_HEADER,
+        max_length=MAX_KEY_LENGTH,
+        description="Repeats with the same key return the first request's result instead of re-running it",
+    ),
 ):
-    start = time.time()
     request_id = uuid.uuid4()
+    set_request_id(request_id)
 
-    logger.info("request_received", extra={"request_id": str(request_id), "task_type": body.task_type})
+    logger.info("request_received", extra={
+        "request_id": str(request_id),
+        "task_type": body.task_type,
+        "mode": mode,
+    })
 
+    async def execute():
+        if mode == "async":
+            get_job_executor().submit(request_id, body)
+            return JobAccepted(request_id=request_id, status=PENDING)
+        async with admission(body.task_type):
+            return await run_pipeline(request_id, body)
+
+    start = time.time()
+    replayed = False
     try:
-        # Step 1: Refine user input via LangChain
-        refined_input = await refine_request(body.user_input, body.task_type)
-        logger.info("request_refined", extra={"request_id": str(request_id)})
-
-        # Step 2: Call Worker
-        worker_result = await call_worker(request_id, body.task_type, refined_input)
-        logger.info("worker_completed", extra={
-            "request_id": str(request_id),
-            "prompt_version": worker_result.prompt_version,
-            "latency_ms": worker_result.latency_ms,
-        })
-
-        # Step 3: Call Evaluator
-        eval_result = await call_evaluator(
-            request_id, body.task_type, body.user_input, refined_input, worker_result.output,
-        )
-        logger.info("evaluation_completed", extra={
-            "request_id": str(request_id),
-            "score": eval_result.score,
-            "passed": eval_result.passed,
-        })
-
-        # Step 4: Save execution log
-        from services.common.models import ExecutionLog
-        log = ExecutionLog(
-            request_id=request_id,
-            task_type=body.task_type,
-            user_input=body.user_input,
-            refined_input=refined_input,
-            prompt_version=worker_result.prompt_version,
-            worker_output=worker_result.output,
-            worker_latency_ms=worker_result.latency_ms,
-            evaluation_score=eval_result.score,
-            evaluation_passed=eval_result.passed,
-            evaluation_detail=eval_result.detail.model_dump(),
-        )
-        db.add(log)
-        await db.commit()
-
-        REQUEST_COUNT.labels(service="manager", task_type=body.task_type, status="success").inc()
-
-        return RequestResponse(
-            request_id=request_id,
-            refined_input=refined_input,
-            worker_output=worker_result.output,
-            evaluation_score=eval_result.score,
-            evaluation_passed=eval_result.passed,
-            prompt_version=worker_result.prompt_version,
+        if idempotency_key:
+            result, replayed = await get_idempotency_store().run(
+                idempotency_key, fingerprint(mode, body.model_dump_json()), execute,
+            )
+        else:
+            result = await execute()
+    except IdempotencyKeyReused as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except AdmissionRejected as e:
+        raise _shed(e)
+    except CircuitOpenError as e:
+        # Shed load quickly: the client can back off instead of queueing on a timeout
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(max(math.ceil(e.retry_after), 1))})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if mode == "sync":
+            elapsed = time.time() - start
+            REQUEST_LATENCY.labels(service="manager", endpoint="/api/v1/request").observe(elapsed, exemplar=exemplar())
+
+    headers = {REPLAYED_HEADER: "true"} if replayed else {}
+    if mode == "async":
+        return JSONResponse(
+            status_code=202,
+            content=result.model_dump(mode="json"),
+            headers={"Location": f"/api/v1/request/{result.request_id}", **headers},
         )
+    response.headers.update(headers)
+    return result
 
-    except Exception as e:
-        REQUEST_COUNT.labels(service="manager", task_type=body.task_type, status="error").inc()
-        logger.error("request_failed", extra={"request_id": str(request_id), "error": str(e)})
 
-        # Save error log — wrapped so a DB failure doesn't mask the original error
+@router.post("/request/stream")
+async def handle_request_stream(body: RequestInput):
+    """Run the pipeline and emit Server-Sent Events as each stage completes"""
+    request_id = uuid.uuid4()
+    set_request_id(request_id)
+    logger.info("request_received", extra={
+        "request_id": str(request_id),
+        "task_type": body.task_type,
+        "mode": "stream",
+    })
+
+    # Admit before the response starts so a rejection can still be a 429/503
+    slot = AsyncExitStack()
+    try:
+        await slot.enter_async_context(admission(body.task_type))
+    except AdmissionRejected as e:
+        raise _shed(e)
+
+    async def sse():
+        start = time.time()
         try:
-            from services.common.models import ExecutionLog
-            error_log = ExecutionLog(
-                request_id=request_id,
-                task_type=body.task_type,
-                user_input=body.user_input,
-                error_message=str(e),
+            async for event, data in stream_pipeline(request_id, body):
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            # Release as soon as the pipeline is done; the response releases it too if this never runs
+            await slot.aclose()
+            REQUEST_LATENCY.labels(service="manager", endpoint="/api/v1/request/stream").observe(
+                time.time() - start, exemplar=exemplar(),
             )
-            db.add(error_log)
-            await db.commit()
-        except Exception as log_err:
-            logger.error("error_log_save_failed", extra={
-                "request_id": str(request_id),
-                "log_error": str(log_err),
-            })
-        raise HTTPException(status_code=500, detail=str(e))
 
-    finally:
-        elapsed = time.time() - start
-        REQUEST_LATENCY.labels(service="manager", endpoint="/api/v1/request").observe(elapsed)
+    return _AdmittedStreamingResponse(
+        sse(),
+        slot,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/requests:batch", response_model=BatchResponse)
+async def handle_batch(
+    body: BatchRequestInput,
+    stream: bool = Query(default=False, description="Stream per-item results as NDJSON as they finish"),
+):
+    """Run many requests with bounded fan-out; partial failures are reported per item"""
+    settings = get_settings()
+    if len(body.items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(body.items)} items (max {settings.BATCH_MAX_ITEMS})",
+        )
+    concurrency = min(body.concurrency or settings.BATCH_CONCURRENCY, settings.BATCH_MAX_CONCURRENCY)
+
+    logger.info("batch_received", extra={"items": len(body.items), "concurrency": concurrency})
+
+    if stream:
+        async def ndjson():
+            async for item in run_batch(body.items, concurrency):
+                yield item.model_dump_json() + "\n"
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    start = time.time()
+    results = [item async for item in run_batch(body.items, concurrency)]
+    results.sort(key=lambda item: item.index)
+    REQUEST_LATENCY.labels(service="manager", endpoint="/api/v1/requests:batch").observe(
+        time.time() - start, exemplar=exemplar(),
+    )
+
+    succeeded = sum(1 for item in results if item.status == "completed")
+    return BatchResponse(
+        total=len(results),
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+        results=results,
+    )
+
 
 @router.get("/requests")
 async def get_all_requests(
@@ -152,24 +256,40 @@ async def get_all_requests(
     }
 
 
-@router.get("/request/{request_id}", response_model=RequestResponse)
+@router.get("/request/{request_id}", response_model=RequestStatusResponse)
 async def get_request_by_id(
     request_id: uuid.UUID,
+    wait: float = Query(default=0, ge=0, description="Long-poll: seconds to wait for an in-flight job"),
     db: AsyncSession = Depends(get_db),
 ):
-    """Get a specific request log by request_id"""
+    """Get a request's status and result; in-flight async jobs are served from memory"""
     from services.common.models import ExecutionLog
 
+    job = get_job_executor().get(request_id)
+    if job is not None:
+        if wait > 0 and not job.done.is_set():
+            timeout = min(wait, get_settings().JOB_MAX_WAIT_SECONDS)
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        if job.result is not None:
+            return RequestStatusResponse(status=job.status, **job.result.model_dump())
+        return RequestStatusResponse(request_id=request_id, status=job.status, error_message=job.error)
+
     result = await db.execute(select(ExecutionLog).where(ExecutionLog.request_id == request_id))
     log = result.scalar_one_or_none()
     if not log:
         raise HTTPException(status_code=404, detail="Log not found")
 
-    return RequestResponse(
+    return RequestStatusResponse(
         request_id=log.request_id,
+        status=FAILED if log.error_message else COMPLETED,
         refined_input=log.refined_input,
         worker_output=log.worker_output,
         evaluation_score=log.evaluation_score,
         evaluation_passed=log.evaluation_passed,
+        evaluation_status=None if log.error_message else (log.evaluation_detail or {}).get("evaluation_status", "completed"),
         prompt_version=log.prompt_version,
-    )
\ No newline at end of file
+        error_message=log.error_message,
+    )
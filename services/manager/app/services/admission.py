@@ -0,0 +1,205 @@
+import asyncio
+import math
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Optional
+
+from services.common.config import get_settings
+from services.common.deadline import remaining
+from services.common.logging_utils import setup_logger
+from services.common.metrics import (
+    ADMISSION_IN_FLIGHT, ADMISSION_QUEUE_DEPTH, ADMISSION_QUEUE_WAIT, ADMISSION_REJECTED,
+)
+
+logger = setup_logger("manager.admission")
+
+# Weight of the newest sample in the average time a slot is held
+_EWMA_ALPHA = 0.1
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of admitted.
+
+    ``status_code`` is 429 when the task type's own limit is the bottleneck,
+    503 when the whole manager is at capacity.
+    """
+
+    def __init__(self, reason: str, status_code: int, retry_after: float):
+        super().__init__(f"Request shed: {reason.replace('_', ' ')}")
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+@dataclass
+class _Waiter:
+    task_type: str
+    future: asyncio.Future = field(default_factory=lambda: asyncio.get_running_loop().create_future())
+
+
+class AdmissionController:
+    """Concurrency limits with a bounded FIFO wait queue.
+
+    A request runs when a global slot and a slot for its task type are both
+    free. Otherwise it waits in the queue, unless the queue is full or the
+    estimated wait already exceeds ``max_wait_seconds``. In those cases it
+    is rejected immediately. Released slots go to the oldest waiter whose
+    task type has room, so one saturated task type doesn't block the others.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        task_type_limits: dict[str, int],
+        default_task_type_limit: int,
+        max_queue: int,
+        max_wait_seconds: float,
+    ):
+        self.max_concurrency = max_concurrency
+        self.task_type_limits = task_type_limits
+        self.default_task_type_limit = default_task_type_limit
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self._in_flight = 0
+        self._in_flight_by_type: dict[str, int] = defaultdict(int)
+        self._waiters: deque[_Waiter] = deque()
+        self._hold_ewma = 0.0
+
+    def _type_limit(self, task_type: str) -> Optional[int]:
+        limit = self.task_type_limits.get(task_type, self.default_task_type_limit)
+        return limit if limit > 0 else None
+
+    def _type_full(self, task_type: str) -> bool:
+        limit = self._type_limit(task_type)
+        return limit is not None and self._in_flight_by_type[task_type] >= limit
+
+    def _has_room(self, task_type: str) -> bool:
+        return self._in_flight < self.max_concurrency and not self._type_full(task_type)
+
+    def _take(self, task_type: str) -> None:
+        self._in_flight += 1
+        self._in_flight_by_type[task_type] += 1
+        ADMISSION_IN_FLIGHT.labels(task_type=task_type).set(self._in_flight_by_type[task_type])
+
+    def _estimated_wait(self, task_type: str, position: int) -> float:
+        """Rough queue time: waiters ahead, drained `limit` at a time, one average hold each."""
+        limit = min(self.max_concurrency, self._type_limit(task_type) or self.max_concurrency)
+        return math.ceil(position / limit) * self._hold_ewma
+
+    def _reject(self, task_type: str, reason: str, estimate: float) -> AdmissionRejected:
+        status = 429 if self._type_full(task_type) and self._in_flight < self.max_concurrency else 503
+        ADMISSION_REJECTED.labels(task_type=task_type, reason=reason).inc()
+        logger.warning("request_shed", extra={
+            "task_type": task_type, "reason": reason, "in_flight": self._in_flight, "queued": len(self._waiters),
+        })
+        return AdmissionRejected(reason, status, max(estimate, 1.0))
+
+    async def acquire(self, task_type: str) -> None:
+        # Waiters only remain queued while blocked, so room now means no one of this type is ahead
+        if self._has_room(task_type):
+            self._take(task_type)
+            ADMISSION_QUEUE_WAIT.labels(task_type=task_type).observe(0.0)
+            return
+
+        budget = self.max_wait_seconds
+        left = remaining()
+        if left is not None:
+            budget = min(budget, left)
+        estimate = self._estimated_wait(task_type, len(self._waiters) + 1)
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject(task_type, "queue_full", estimate)
+        if estimate > budget:
+            raise self._reject(task_type, "queue_wait_budget", estimate)
+
+        waiter = _Waiter(task_type)
+        self._waiters.append(waiter)
+        ADMISSION_QUEUE_DEPTH.set(len(self._waiters))
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=budget)
+        except asyncio.TimeoutError:
+            if not (waiter.future.done() and not waiter.future.cancelled()):
+                raise self._reject(task_type, "queue_timeout", self._estimated_wait(task_type, len(self._waiters)))
+            # Granted in the same tick the wait timed out: keep the slot
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted a slot just as the caller went away: hand it on
+                self.release(task_type, hold_seconds=None)
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                ADMISSION_QUEUE_DEPTH.set(len(self._waiters))
+            if not waiter.future.done():
+                waiter.future.cancel()
+        ADMISSION_QUEUE_WAIT.labels(task_type=task_type).observe(time.monotonic() - start)
+
+    def release(self, task_type: str, hold_seconds: Optional[float]) -> None:
+        self._in_flight -= 1
+        self._in_flight_by_type[task_type] -= 1
+        ADMISSION_IN_FLIGHT.labels(task_type=task_type).set(self._in_flight_by_type[task_type])
+        if hold_seconds is not None:
+            self._hold_ewma = (
+                hold_seconds if self._hold_ewma == 0.0
+                else _EWMA_ALPHA * hold_seconds + (1 - _EWMA_ALPHA) * self._hold_ewma
+            )
+        self._wake()
+
+    def _wake(self) -> None:
+        for waiter in list(self._waiters):
+            if self._in_flight >= self.max_concurrency:
+                break
+            if waiter.future.done() or self._type_full(waiter.task_type):
+                continue
+            self._take(waiter.task_type)
+            waiter.future.set_result(None)
+            self._waiters.remove(waiter)
+        ADMISSION_QUEUE_DEPTH.set(len(self._waiters))
+
+    @asynccontextmanager
+    async def admit(self, task_type: str):
+        await self.acquire(task_type)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(task_type, time.monotonic() - start)
+
+
+def _parse_limits(raw: str) -> dict[str, int]:
+    """Parse "code_generation=16,summarize=4" into {"code_generation": 16, "summarize": 4}."""
+    limits = {}
+    for item in raw.split(","):
+        if "=" in item:
+            task_type, limit = item.split("=", 1)
+            limits[task_type.strip()] = int(limit)
+    return limits
+
+
+_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    global _controller
+    if _controller is None:
+        settings = get_settings()
+        _controller = AdmissionController(
+            max_concurrency=settings.ADMISSION_MAX_CONCURRENCY,
+            task_type_limits=_parse_limits(settings.ADMISSION_TASK_TYPE_LIMITS),
+            default_task_type_limit=settings.ADMISSION_DEFAULT_TASK_TYPE_LIMIT,
+            max_queue=settings.ADMISSION_MAX_QUEUE,
+            max_wait_seconds=settings.ADMISSION_MAX_QUEUE_WAIT_SECONDS,
+        )
+    return _controller
+
+
+@asynccontextmanager
+async def admission(task_type: str):
+    """Hold an admission slot for the enclosed pipeline run, when admission control is on."""
+    if not get_settings().ADMISSION_ENABLED:
+        yield
+        return
+    async with get_admission_controller().admit(task_type):
+        yield
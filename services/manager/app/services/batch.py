@@ -0,0 +1,77 @@
+import asyncio
+import time
+import uuid
+from typing import AsyncIterator
+
+from services.common.deadline import deadline_scope, default_deadline_seconds
+from services.common.logging_utils import setup_logger
+from services.common.metrics import REQUEST_COUNT, BATCH_ITEMS_TOTAL
+from services.common.models import ExecutionLog
+from services.common.schemas import RequestInput, BatchItemResult
+from services.common.tracing import set_request_id
+from services.manager.app.services.pipeline import (
+    execute_shared, finish_evaluation, build_execution_log, build_error_log, build_response, save_logs,
+)
+from services.manager.app.services.stage_result import elapsed_ms
+
+logger = setup_logger("manager.batch")
+
+
+async def run_batch(items: list[RequestInput], concurrency: int) -> AsyncIterator[BatchItemResult]:
+    """Run the pipeline for every item with at most `concurrency` in flight.
+
+    Yields per-item results in completion order. A failing item yields an
+    error result instead of aborting the batch. ExecutionLog rows are
+    written in a single bulk insert once every item has finished, except
+    rows whose evaluation was deferred: those are saved as the item
+    finishes so the evaluation queue has a row to update.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    logs: list[ExecutionLog] = []
+
+    async def run_one(index: int, body: RequestInput) -> BatchItemResult:
+        request_id = uuid.uuid4()
+        set_request_id(request_id)
+        # Each item gets its own budget once it holds a slot, not a share of the whole batch's
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                with deadline_scope(default_deadline_seconds()):
+                    result = await execute_shared(request_id, body)
+                    result = await finish_evaluation(request_id, body, result)
+            except Exception as e:
+                logger.error("batch_item_failed", extra={"request_id": str(request_id), "error": str(e)})
+                logs.append(build_error_log(request_id, body, e))
+                REQUEST_COUNT.labels(service="manager", task_type=body.task_type, status="error").inc()
+                BATCH_ITEMS_TOTAL.labels(status="failed").inc()
+                return BatchItemResult(index=index, request_id=request_id, status="failed", error=str(e))
+            total_latency_ms = elapsed_ms(start)
+        log = build_execution_log(request_id, body, result, total_latency_ms=total_latency_ms)
+        if result.evaluation is None:
+            # The deferred evaluation is already queued; shielded like the bulk save below
+            try:
+                await asyncio.shield(save_logs([log]))
+            except Exception as e:
+                logger.error("batch_log_save_failed", extra={"count": 1, "error": str(e)})
+        else:
+            logs.append(log)
+        REQUEST_COUNT.labels(service="manager", task_type=body.task_type, status="success").inc()
+        BATCH_ITEMS_TOTAL.labels(status="completed").inc()
+        return BatchItemResult(
+            index=index, request_id=request_id, status="completed", result=build_response(request_id, result),
+        )
+
+    tasks = [asyncio.create_task(run_one(i, body)) for i, body in enumerate(items)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
+        if logs:
+            # Shielded so a client disconnect on the streaming path still persists finished items
+            try:
+                await asyncio.shield(save_logs(logs))
+                logger.info("batch_logs_saved", extra={"count": len(logs)})
+            except Exception as e:
+                logger.error("batch_log_save_failed", extra={"count": len(logs), "error": str(e)})
@@ -0,0 +1,62 @@
+import asyncio
+import hashlib
+import re
+from typing import Awaitable, Callable, Hashable, Optional, TypeVar
+
+from services.common.logging_utils import setup_logger
+from services.common.metrics import COALESCED_REQUESTS
+
+logger = setup_logger("manager.coalescer")
+
+T = TypeVar("T")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_input(user_input: str) -> str:
+    return _WHITESPACE.sub(" ", user_input).strip()
+
+
+def request_key(task_type: str, user_input: str, prompt_version: Optional[int]) -> str:
+    """Stable key for (task_type, normalized user_input, active prompt version)."""
+    raw = f"{task_type}\x00{prompt_version}\x00{normalize_input(user_input)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """Share one in-flight coroutine between concurrent callers with the same key.
+
+    The first caller starts the work as a task; later callers await the same
+    task. The task is shielded, so one caller cancelling (e.g. a client
+    disconnect) does not cancel it for the others. The key is released as
+    soon as the task finishes, so only concurrent duplicates are coalesced.
+    """
+
+    def __init__(self):
+        self._in_flight: dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]], label: str = "") -> tuple[T, bool]:
+        """Return (result, leader), where leader is True for the caller whose call started the work."""
+        task = self._in_flight.get(key)
+        leader = task is None
+        if leader:
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _t: self._in_flight.pop(key, None))
+        else:
+            COALESCED_REQUESTS.labels(task_type=label).inc()
+            logger.info("request_coalesced", extra={"task_type": label})
+        return await asyncio.shield(task), leader
+
+
+_single_flight: Optional[SingleFlight] = None
+
+
+def get_single_flight() -> SingleFlight:
+    global _single_flight
+    if _single_flight is None:
+        _single_flight = SingleFlight()
+    return _single_flight
@@ -0,0 +1,220 @@
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Optional
+
+from sqlalchemy import func, update
+
+from services.common.config import get_settings
+from services.common.db import db_session
+from services.common.instrumentation import stage
+from services.common.logging_utils import setup_logger
+from services.common.metrics import EVAL_QUEUE_DEPTH, EVAL_TASKS_TOTAL, EVAL_LAG
+from services.common.models import ExecutionLog
+from services.common.schemas import RequestInput, EvaluateOutput
+from services.common.tracing import Span, current_span, set_request_id, span
+from services.manager.app.services.router import call_evaluator
+from services.manager.app.services.stage_result import StageResult, elapsed_ms
+
+logger = setup_logger("manager.evaluation_queue")
+
+EVAL_PENDING = "pending"
+EVAL_COMPLETED = "completed"
+EVAL_FAILED = "failed"
+
+
+class EvaluationQueueFullError(Exception):
+    """Raised when the deferred evaluation queue is at capacity."""
+
+
+class _RowNotWritten(Exception):
+    """The ExecutionLog row is not in the DB yet (still buffered); retry the update."""
+
+
+@dataclass
+class EvaluationTask:
+    request_id: uuid.UUID
+    body: RequestInput
+    result: StageResult
+    attempts: int = 0
+    # Set once the evaluator has answered, so a retry only redoes the DB write
+    evaluation: Optional[EvaluateOutput] = None
+    roundtrip_ms: Optional[int] = None
+    enqueued_at: float = field(default_factory=time.time)
+    # Span of the request that deferred this evaluation, so the work joins its trace
+    trace_parent: Optional[Span] = field(default_factory=current_span)
+
+
+def evaluation_detail(evaluation: EvaluateOutput, result: StageResult) -> dict:
+    detail = evaluation.detail.model_dump()
+    if result.refine_detail:
+        # Both stages may have fallen back; keep the evaluator's list and add the refiner's
+        fallbacks = detail.get("fallbacks", []) + result.refine_detail.get("fallbacks", [])
+        detail.update(result.refine_detail)
+        detail["fallbacks"] = fallbacks
+    return detail
+
+
+class EvaluationQueue:
+    """Background evaluator for pipeline runs that returned before evaluation.
+
+    The response has already been sent with the evaluation pending. A fixed
+    pool of consumers calls the evaluator and fills in the ExecutionLog row.
+    Evaluator errors, and rows the log sink has not flushed yet, are retried
+    with exponential backoff up to ``max_retries`` times; once the evaluator
+    has answered, retries only redo the DB write. After that the row is
+    marked failed.
+    """
+
+    def __init__(self, concurrency: int, max_queue: int, max_retries: int, retry_backoff: float):
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._queue: asyncio.Queue[EvaluationTask] = asyncio.Queue(maxsize=max_queue)
+        self._consumers: list[asyncio.Task] = []
+        self._retries: set[asyncio.Task] = set()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._consumers)
+
+    def start(self) -> None:
+        for i in range(self.concurrency):
+            self._consumers.append(asyncio.create_task(self._consume(), name=f"evaluation-consumer-{i}"))
+        logger.info("evaluation_queue_started", extra={"concurrency": self.concurrency})
+
+    async def stop(self, drain_timeout: float) -> None:
+        """Let queued evaluations finish for up to drain_timeout seconds, then cancel the rest."""
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("evaluation_queue_drain_timeout", extra={"pending": self._queue.qsize()})
+        for task in [*self._consumers, *self._retries]:
+            task.cancel()
+        await asyncio.gather(*self._consumers, *self._retries, return_exceptions=True)
+        self._consumers.clear()
+        self._retries.clear()
+        logger.info("evaluation_queue_stopped")
+
+    def submit(self, request_id: uuid.UUID, body: RequestInput, result: StageResult) -> None:
+        try:
+            self._queue.put_nowait(EvaluationTask(request_id=request_id, body=body, result=result))
+        except asyncio.QueueFull:
+            EVAL_TASKS_TOTAL.labels(status="rejected").inc()
+            raise EvaluationQueueFullError("Evaluation queue is full")
+        EVAL_QUEUE_DEPTH.set(self._queue.qsize())
+        EVAL_TASKS_TOTAL.labels(status="submitted").inc()
+
+    async def _consume(self) -> None:
+        while True:
+            task = await self._queue.get()
+            EVAL_QUEUE_DEPTH.set(self._queue.qsize())
+            try:
+                with span("deferred_evaluation", parent=task.trace_parent, service="manager"):
+                    set_request_id(task.request_id)
+                    await self._run(task)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, task: EvaluationTask) -> None:
+        rid = str(task.request_id)
+        task.attempts += 1
+        try:
+            if task.evaluation is None:
+                start = time.perf_counter()
+                task.evaluation = await call_evaluator(
+                    task.request_id, task.body.task_type, task.body.user_input,
+                    task.result.refined_input, task.result.worker_output,
+                )
+                task.roundtrip_ms = elapsed_ms(start)
+            await self._write(task)
+        except Exception as e:
+            if task.attempts <= self.max_retries:
+                EVAL_TASKS_TOTAL.labels(status="retried").inc()
+                logger.warning("deferred_evaluation_retry", extra={
+                    "request_id": rid, "attempt": task.attempts, "error": str(e),
+                })
+                self._schedule_retry(task)
+                return
+            EVAL_TASKS_TOTAL.labels(status="failed").inc()
+            logger.error("deferred_evaluation_failed", extra={"request_id": rid, "error": str(e)})
+            await self._mark_failed(task, e)
+            return
+
+        lag = time.time() - task.enqueued_at
+        EVAL_LAG.labels(task_type=task.body.task_type).observe(lag)
+        EVAL_TASKS_TOTAL.labels(status="completed").inc()
+        logger.info("deferred_evaluation_completed", extra={
+            "request_id": rid,
+            "score": task.evaluation.score,
+            "passed": task.evaluation.passed,
+            "lag_ms": int(lag * 1000),
+        })
+
+    def _schedule_retry(self, task: EvaluationTask) -> None:
+        # Sleep outside the consumer so one backing-off row doesn't hold a slot
+        async def requeue():
+            await asyncio.sleep(self.retry_backoff * (2 ** (task.attempts - 1)))
+            try:
+                self._queue.put_nowait(task)
+                EVAL_QUEUE_DEPTH.set(self._queue.qsize())
+            except asyncio.QueueFull:
+                await self._run(task)
+
+        retry = asyncio.create_task(requeue())
+        self._retries.add(retry)
+        retry.add_done_callback(self._retries.discard)
+
+    @stage("manager", "db_write")
+    async def _update(self, request_id: uuid.UUID, values: dict) -> int:
+        async with db_session() as db:
+            result = await db.execute(
+                update(ExecutionLog).where(ExecutionLog.request_id == request_id).values(**values)
+            )
+            await db.commit()
+            return result.rowcount
+
+    async def _write(self, task: EvaluationTask) -> None:
+        evaluation = task.evaluation
+        updated = await self._update(task.request_id, {
+            "evaluation_score": evaluation.score,
+            "evaluation_passed": evaluation.passed,
+            "evaluation_detail": evaluation_detail(evaluation, task.result),
+            "evaluator_roundtrip_ms": task.roundtrip_ms,
+            "rule_validation_ms": evaluation.detail.rule_latency_ms,
+            # Judge usage adds to what the row already holds for refine + worker
+            "input_tokens": func.coalesce(ExecutionLog.input_tokens, 0) + evaluation.usage.input_tokens,
+            "output_tokens": func.coalesce(ExecutionLog.output_tokens, 0) + evaluation.usage.output_tokens,
+            "llm_cost_usd": func.coalesce(ExecutionLog.llm_cost_usd, 0) + evaluation.usage.cost_usd,
+        })
+        if not updated:
+            raise _RowNotWritten(f"ExecutionLog row {task.request_id} not written yet")
+
+    async def _mark_failed(self, task: EvaluationTask, error: Exception) -> None:
+        detail = {**(task.result.refine_detail or {}), "evaluation_status": EVAL_FAILED, "evaluation_error": str(error)}
+        try:
+            updated = await self._update(task.request_id, {"evaluation_detail": detail})
+        except Exception as e:
+            logger.error("deferred_evaluation_mark_failed", extra={"request_id": str(task.request_id), "error": str(e)})
+            return
+        if not updated:
+            # No row to flag: the run's log was never persisted, so nothing will show it as failed
+            EVAL_TASKS_TOTAL.labels(status="row_missing").inc()
+            logger.error("deferred_evaluation_row_missing", extra={"request_id": str(task.request_id)})
+
+
+_queue: Optional[EvaluationQueue] = None
+
+
+def get_evaluation_queue() -> EvaluationQueue:
+    global _queue
+    if _queue is None:
+        settings = get_settings()
+        _queue = EvaluationQueue(
+            concurrency=settings.EVAL_QUEUE_CONCURRENCY,
+            max_queue=settings.EVAL_QUEUE_MAX,
+            max_retries=settings.EVAL_MAX_RETRIES,
+            retry_backoff=settings.EVAL_RETRY_BACKOFF_SECONDS,
+        )
+    return _queue
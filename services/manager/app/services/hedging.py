@@ -0,0 +1,117 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import numpy as np
+
+from services.common.config import get_settings
+from services.common.logging_utils import setup_logger
+from services.common.metrics import HEDGES_TOTAL, HEDGE_DELAY
+from services.manager.app.services.resilience import RetryBudget
+
+logger = setup_logger("manager.hedging")
+
+T = TypeVar("T")
+
+
+class LatencyTracker:
+    """Recent call latencies for one target, kept in-process."""
+
+    def __init__(self, window_size: int, min_samples: int):
+        self.min_samples = min_samples
+        self._samples: deque[float] = deque(maxlen=window_size)
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """The q-th percentile of recent latencies, or None until min_samples are seen."""
+        if len(self._samples) < self.min_samples:
+            return None
+        return float(np.percentile(np.fromiter(self._samples, dtype=np.float64), q))
+
+
+class Hedger:
+    """Sends a second copy of a slow call and takes whichever finishes first.
+
+    The hedge fires once the first attempt has run longer than the
+    ``percentile`` of recent latencies. Hedges are capped at ``max_ratio``
+    of calls within the budget window, so they cannot double load during a
+    slowdown. The losing attempt is cancelled.
+    """
+
+    def __init__(self, target: str, percentile: float, tracker: LatencyTracker, budget: RetryBudget):
+        self.target = target
+        self.percentile = percentile
+        self.tracker = tracker
+        self.budget = budget
+
+    async def call(self, attempt: Callable[[], Awaitable[T]]) -> T:
+        self.budget.record_request()
+        delay = self.tracker.percentile(self.percentile)
+        start = time.monotonic()
+        primary = asyncio.create_task(attempt())
+        tasks = [primary]
+        try:
+            if delay is not None:
+                await asyncio.wait({primary}, timeout=delay)
+            if primary.done() or delay is None:
+                result = await primary
+            elif not self.budget.try_retry():
+                HEDGES_TOTAL.labels(target=self.target, result="capped").inc()
+                result = await primary
+            else:
+                HEDGES_TOTAL.labels(target=self.target, result="issued").inc()
+                HEDGE_DELAY.labels(target=self.target).observe(delay)
+                logger.info("hedge_issued", extra={"target": self.target, "delay_ms": int(delay * 1000)})
+                hedge = asyncio.create_task(attempt())
+                tasks.append(hedge)
+                result = await self._first_success(primary, hedge)
+            # Latency as the caller saw it, hedge delay included
+            self.tracker.observe(time.monotonic() - start)
+            return result
+        finally:
+            pending = [task for task in tasks if not task.done()]
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _first_success(self, primary: asyncio.Task, hedge: asyncio.Task):
+        pending = {primary, hedge}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        HEDGES_TOTAL.labels(target=self.target, result="won").inc()
+                    return task.result()
+        # Both failed: surface the primary's error
+        return primary.result()
+
+
+_hedgers: dict[str, Hedger] = {}
+
+
+def get_hedger(target: str) -> Hedger:
+    hedger = _hedgers.get(target)
+    if hedger is None:
+        settings = get_settings()
+        hedger = _hedgers[target] = Hedger(
+            target,
+            percentile=settings.HEDGE_PERCENTILE,
+            tracker=LatencyTracker(settings.HEDGE_WINDOW_SIZE, settings.HEDGE_MIN_SAMPLES),
+            budget=RetryBudget(
+                ratio=settings.HEDGE_MAX_RATIO,
+                window_seconds=settings.HEDGE_BUDGET_WINDOW_SECONDS,
+                min_retries=0,
+            ),
+        )
+    return hedger
+
+
+async def maybe_hedge(target: str, attempt: Callable[[], Awaitable[T]]) -> T:
+    if not get_settings().HEDGE_ENABLED:
+        return await attempt()
+    return await get_hedger(target).call(attempt)
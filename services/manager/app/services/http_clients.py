@@ -0,0 +1,95 @@
+from contextlib import asynccontextmanager
+
+import httpx
+
+from services.common.config import get_settings
+from services.common.logging_utils import setup_logger
+from services.common.tracing import TracingTransport
+from services.common.metrics import (
+    HTTP_CLIENT_IN_FLIGHT, HTTP_CLIENT_POOL_LIMIT, HTTP_CLIENT_POOL_TIMEOUTS,
+)
+
+logger = setup_logger("manager.http_clients")
+
+WORKER = "worker"
+EVALUATOR = "evaluator"
+
+_clients: dict[str, httpx.AsyncClient] = {}
+
+
+def _build_client(target: str) -> httpx.AsyncClient:
+    settings = get_settings()
+    if target == WORKER:
+        base_url = settings.WORKER_URL
+        connect_timeout = settings.WORKER_CONNECT_TIMEOUT
+        read_timeout = settings.WORKER_READ_TIMEOUT
+    elif target == EVALUATOR:
+        base_url = settings.EVALUATOR_URL
+        connect_timeout = settings.EVALUATOR_CONNECT_TIMEOUT
+        read_timeout = settings.EVALUATOR_READ_TIMEOUT
+    else:
+        raise ValueError(f"Unknown HTTP client target: {target}")
+
+    limits = httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+    )
+    # Pool timeout shares the connect budget: waiting for a free slot is setup cost too
+    timeout = httpx.Timeout(
+        read_timeout,
+        connect=connect_timeout,
+        read=read_timeout,
+        pool=connect_timeout,
+    )
+    HTTP_CLIENT_POOL_LIMIT.labels(service="manager", target=target).set(settings.HTTP_MAX_CONNECTIONS)
+    logger.info("http_client_created", extra={
+        "target": target,
+        "base_url": base_url,
+        "http2": settings.HTTP2_ENABLED,
+        "max_connections": settings.HTTP_MAX_CONNECTIONS,
+    })
+    # Limits and HTTP/2 belong to the transport once a custom one is passed
+    transport = TracingTransport(httpx.AsyncHTTPTransport(limits=limits, http2=settings.HTTP2_ENABLED))
+    return httpx.AsyncClient(
+        base_url=base_url,
+        timeout=timeout,
+        transport=transport,
+    )
+
+
+def init_clients() -> None:
+    """Create the long-lived per-target clients. Called from the manager lifespan."""
+    for target in (WORKER, EVALUATOR):
+        if target not in _clients:
+            _clients[target] = _build_client(target)
+
+
+async def close_clients() -> None:
+    """Close all pooled connections. Called from the manager lifespan."""
+    for target, client in list(_clients.items()):
+        await client.aclose()
+        logger.info("http_client_closed", extra={"target": target})
+    _clients.clear()
+
+
+def get_client(target: str) -> httpx.AsyncClient:
+    """Return the shared client for a target, creating it lazily outside the app lifespan."""
+    client = _clients.get(target)
+    if client is None:
+        client = _clients[target] = _build_client(target)
+    return client
+
+
+@asynccontextmanager
+async def track_request(target: str):
+    """Track in-flight requests and pool exhaustion for saturation metrics."""
+    in_flight = HTTP_CLIENT_IN_FLIGHT.labels(service="manager", target=target)
+    in_flight.inc()
+    try:
+        yield
+    except httpx.PoolTimeout:
+        HTTP_CLIENT_POOL_TIMEOUTS.labels(service="manager", target=target).inc()
+        raise
+    finally:
+        in_flight.dec()
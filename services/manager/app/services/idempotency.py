@@ -0,0 +1,86 @@
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from services.common.config import get_settings
+from services.common.logging_utils import setup_logger
+from services.common.lru import LRUCache
+from services.common.metrics import IDEMPOTENCY_REQUESTS
+
+logger = setup_logger("manager.idempotency")
+
+T = TypeVar("T")
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyKeyReused(Exception):
+    """Raised when a key is sent again with a different request body or mode."""
+
+
+def fingerprint(*parts: str) -> str:
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _Execution:
+    fingerprint: str
+    task: asyncio.Task
+
+
+class IdempotencyStore:
+    """Remembers the execution behind each Idempotency-Key for ``ttl_seconds``.
+
+    The first request with a key starts the work as a shielded task, so it
+    runs to completion even if that client disconnects. A repeat with the
+    same key attaches to the task while it runs and gets its stored result
+    afterwards. Failed or cancelled executions are forgotten, so a retry
+    after an error runs again. Entries live in this process only; with
+    several manager replicas, retries must reach the same one to be
+    deduplicated.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self._executions = LRUCache(max_entries, ttl_seconds=ttl_seconds)
+
+    def __len__(self) -> int:
+        return len(self._executions)
+
+    async def run(self, key: str, fingerprint: str, fn: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        """Return (result, replayed), where replayed is True if an earlier request did the work."""
+        execution: Optional[_Execution] = self._executions.get(key)
+        if execution is not None:
+            if execution.fingerprint != fingerprint:
+                IDEMPOTENCY_REQUESTS.labels(result="mismatch").inc()
+                raise IdempotencyKeyReused(f"{IDEMPOTENCY_HEADER} was already used for a different request")
+            result = "replayed" if execution.task.done() else "attached"
+            IDEMPOTENCY_REQUESTS.labels(result=result).inc()
+            logger.info("idempotent_request", extra={"result": result})
+            return await asyncio.shield(execution.task), True
+
+        execution = _Execution(fingerprint, asyncio.ensure_future(fn()))
+        self._executions.set(key, execution)
+        execution.task.add_done_callback(lambda task: self._forget_failed(key, execution))
+        IDEMPOTENCY_REQUESTS.labels(result="new").inc()
+        return await asyncio.shield(execution.task), False
+
+    def _forget_failed(self, key: str, execution: _Execution) -> None:
+        if not execution.task.cancelled() and execution.task.exception() is None:
+            return
+        # Only drop our own entry, not one a later request stored under the same key
+        if self._executions.get(key) is execution:
+            self._executions.pop(key)
+
+
+_store: Optional[IdempotencyStore] = None
+
+
+def get_idempotency_store() -> IdempotencyStore:
+    global _store
+    if _store is None:
+        settings = get_settings()
+        _store = IdempotencyStore(settings.IDEMPOTENCY_MAX_ENTRIES, settings.IDEMPOTENCY_TTL_SECONDS)
+    return _store
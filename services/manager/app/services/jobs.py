@@ -0,0 +1,136 @@
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Optional
+
+from services.common.config import get_settings
+from services.common.deadline import deadline_scope, default_deadline_seconds
+from services.common.logging_utils import setup_logger
+from services.common.lru import LRUCache
+from services.common.metrics import JOB_QUEUE_DEPTH, JOBS_TOTAL, REQUEST_LATENCY
+from services.common.schemas import RequestInput, RequestResponse
+from services.common.tracing import Span, current_span, exemplar, set_request_id, span
+from services.manager.app.services.pipeline import run_pipeline
+
+logger = setup_logger("manager.jobs")
+
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at capacity."""
+
+
+@dataclass
+class Job:
+    request_id: uuid.UUID
+    body: RequestInput
+    status: str = PENDING
+    result: Optional[RequestResponse] = None
+    error: Optional[str] = None
+    submitted_at: float = field(default_factory=time.time)
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+    # Span of the submitting request, so the background run joins its trace
+    trace_parent: Optional[Span] = field(default_factory=current_span)
+
+
+class JobExecutor:
+    """Bounded background executor for async-mode pipeline runs.
+
+    A fixed pool of consumer tasks drains a bounded queue, so a burst of
+    async submissions never runs more than ``concurrency`` pipelines at
+    once. Finished jobs stay in memory for ``result_ttl_seconds`` so
+    pollers on this replica see the result; afterwards the DB row is the
+    source of truth.
+    """
+
+    def __init__(self, concurrency: int, max_queue: int, result_ttl_seconds: float, max_results: int):
+        self.concurrency = concurrency
+        self._queue: asyncio.Queue[Job] = asyncio.Queue(maxsize=max_queue)
+        self._active: dict[uuid.UUID, Job] = {}
+        self._finished = LRUCache(max_results, ttl_seconds=result_ttl_seconds)
+        self._consumers: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        for i in range(self.concurrency):
+            self._consumers.append(asyncio.create_task(self._consume(), name=f"job-consumer-{i}"))
+        logger.info("job_executor_started", extra={"concurrency": self.concurrency})
+
+    async def stop(self, drain_timeout: float) -> None:
+        """Let queued jobs finish for up to drain_timeout seconds, then cancel the rest."""
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("job_executor_drain_timeout", extra={"pending": self._queue.qsize()})
+        for task in self._consumers:
+            task.cancel()
+        await asyncio.gather(*self._consumers, return_exceptions=True)
+        self._consumers.clear()
+        logger.info("job_executor_stopped")
+
+    def submit(self, request_id: uuid.UUID, body: RequestInput) -> Job:
+        job = Job(request_id=request_id, body=body)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            JOBS_TOTAL.labels(status="rejected").inc()
+            raise QueueFullError("Job queue is full")
+        self._active[request_id] = job
+        JOB_QUEUE_DEPTH.set(self._queue.qsize())
+        JOBS_TOTAL.labels(status="submitted").inc()
+        return job
+
+    def get(self, request_id: uuid.UUID) -> Optional[Job]:
+        return self._active.get(request_id) or self._finished.get(request_id)
+
+    async def _consume(self) -> None:
+        while True:
+            job = await self._queue.get()
+            JOB_QUEUE_DEPTH.set(self._queue.qsize())
+            try:
+                with span("job", parent=job.trace_parent, service="manager"):
+                    set_request_id(job.request_id)
+                    await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job) -> None:
+        job.status = RUNNING
+        start = time.time()
+        try:
+            # Runs outside the request that submitted it, so it gets a fresh budget
+            with deadline_scope(default_deadline_seconds()):
+                job.result = await run_pipeline(job.request_id, job.body)
+            job.status = COMPLETED
+        except Exception as e:
+            # run_pipeline already logged and persisted the failure
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            REQUEST_LATENCY.labels(service="manager", endpoint="/api/v1/request?mode=async").observe(
+                time.time() - start, exemplar=exemplar(),
+            )
+            JOBS_TOTAL.labels(status=job.status).inc()
+            self._active.pop(job.request_id, None)
+            self._finished.set(job.request_id, job)
+            job.done.set()
+
+
+_executor: Optional[JobExecutor] = None
+
+
+def get_job_executor() -> JobExecutor:
+    global _executor
+    if _executor is None:
+        settings = get_settings()
+        _executor = JobExecutor(
+            concurrency=settings.JOB_CONCURRENCY,
+            max_queue=settings.JOB_MAX_QUEUE,
+            result_ttl_seconds=settings.JOB_RESULT_TTL_SECONDS,
+            max_results=settings.JOB_MAX_RESULTS,
+        )
+    return _executor
@@ -0,0 +1,216 @@
+import asyncio
+import random
+import socket
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import urlsplit
+
+from services.common.config import get_settings
+from services.common.deadline import is_deadline_error
+from services.common.logging_utils import setup_logger
+from services.common.metrics import (
+    LB_ENDPOINTS, LB_ENDPOINT_IN_FLIGHT, LB_ENDPOINT_LATENCY, LB_EJECTIONS,
+)
+from services.manager.app.services.http_clients import WORKER, EVALUATOR
+from services.manager.app.services.resilience import is_failure
+
+logger = setup_logger("manager.load_balancer")
+
+POLICY_LEAST_OUTSTANDING = "least_outstanding"
+POLICY_P2C = "p2c"
+
+# Weight of the newest sample in the per-endpoint latency average
+_EWMA_ALPHA = 0.2
+
+
+@dataclass
+class Endpoint:
+    base_url: str
+    in_flight: int = 0
+    consecutive_failures: int = 0
+    ejected_until: float = 0.0
+    latency_ewma: float = 0.0
+
+    def url(self, path: str) -> str:
+        return self.base_url + path
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+
+class EndpointPool:
+    """Client-side balancing over the replicas of one target.
+
+    Picks the endpoint with the fewest outstanding requests, or the better
+    of two random ones (``p2c``). An endpoint is ejected for
+    ``eject_seconds`` after ``eject_failures`` consecutive failures. At most
+    ``max_ejected_fraction`` of the pool is ejected at once. The endpoint
+    list can be replaced on refresh; endpoints that stay keep their state.
+    """
+
+    def __init__(
+        self,
+        target: str,
+        base_urls: list[str],
+        policy: str,
+        eject_failures: int,
+        eject_seconds: float,
+        max_ejected_fraction: float,
+    ):
+        if policy not in (POLICY_LEAST_OUTSTANDING, POLICY_P2C):
+            raise ValueError(f"Unknown load balancing policy: {policy}")
+        self.target = target
+        self.policy = policy
+        self.eject_failures = eject_failures
+        self.eject_seconds = eject_seconds
+        self.max_ejected_fraction = max_ejected_fraction
+        self.endpoints: list[Endpoint] = []
+        self.update(base_urls)
+
+    def update(self, base_urls: list[str]) -> None:
+        if not base_urls:
+            return
+        current = {e.base_url: e for e in self.endpoints}
+        self.endpoints = [current.get(url) or Endpoint(url) for url in dict.fromkeys(base_urls)]
+        if set(current) != {e.base_url for e in self.endpoints}:
+            logger.info("lb_endpoints_updated", extra={
+                "target": self.target, "endpoints": [e.base_url for e in self.endpoints],
+            })
+        self._report_healthy()
+
+    def _report_healthy(self) -> None:
+        now = time.monotonic()
+        LB_ENDPOINTS.labels(target=self.target).set(sum(1 for e in self.endpoints if e.healthy(now)))
+
+    def pick(self) -> Endpoint:
+        now = time.monotonic()
+        # If everything is ejected, fall back to the whole pool rather than fail
+        candidates = [e for e in self.endpoints if e.healthy(now)] or self.endpoints
+        if len(candidates) == 1:
+            return candidates[0]
+        if self.policy == POLICY_P2C:
+            a, b = random.sample(candidates, 2)
+            return min((a, b), key=lambda e: (e.in_flight, e.latency_ewma))
+        fewest = min(e.in_flight for e in candidates)
+        return random.choice([e for e in candidates if e.in_flight == fewest])
+
+    def record(self, endpoint: Endpoint, ok: bool, seconds: float) -> None:
+        if ok:
+            endpoint.consecutive_failures = 0
+            endpoint.latency_ewma = (
+                seconds if endpoint.latency_ewma == 0.0
+                else _EWMA_ALPHA * seconds + (1 - _EWMA_ALPHA) * endpoint.latency_ewma
+            )
+            return
+        endpoint.consecutive_failures += 1
+        if endpoint.consecutive_failures < self.eject_failures:
+            return
+        now = time.monotonic()
+        ejected = sum(1 for e in self.endpoints if not e.healthy(now))
+        if endpoint.healthy(now) and ejected + 1 <= self.max_ejected_fraction * len(self.endpoints):
+            endpoint.ejected_until = now + self.eject_seconds
+            endpoint.consecutive_failures = 0
+            LB_EJECTIONS.labels(target=self.target, endpoint=endpoint.base_url).inc()
+            logger.warning("lb_endpoint_ejected", extra={
+                "target": self.target, "endpoint": endpoint.base_url, "seconds": self.eject_seconds,
+            })
+            self._report_healthy()
+
+
+_pools: dict[str, EndpointPool] = {}
+
+
+def _target_settings(target: str) -> tuple[str, str, str]:
+    settings = get_settings()
+    if target == WORKER:
+        return settings.WORKER_URL, settings.WORKER_ENDPOINTS, settings.WORKER_DNS_NAME
+    if target == EVALUATOR:
+        return settings.EVALUATOR_URL, settings.EVALUATOR_ENDPOINTS, settings.EVALUATOR_DNS_NAME
+    raise ValueError(f"Unknown load balancing target: {target}")
+
+
+def _static_endpoints(target: str) -> list[str]:
+    url, endpoints, _ = _target_settings(target)
+    urls = [e.strip().rstrip("/") for e in endpoints.split(",") if e.strip()]
+    return urls or [url.rstrip("/")]
+
+
+async def _resolve_endpoints(target: str) -> list[str]:
+    """Endpoints from the target's headless-service DNS name (scheme and port from its URL)."""
+    url, _, dns_name = _target_settings(target)
+    parts = urlsplit(url)
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    infos = await asyncio.get_running_loop().getaddrinfo(dns_name, port, type=socket.SOCK_STREAM)
+    hosts = sorted({info[4][0] for info in infos})
+    return [f"{parts.scheme}://[{h}]:{port}" if ":" in h else f"{parts.scheme}://{h}:{port}" for h in hosts]
+
+
+def get_pool(target: str) -> EndpointPool:
+    pool = _pools.get(target)
+    if pool is None:
+        settings = get_settings()
+        pool = _pools[target] = EndpointPool(
+            target,
+            _static_endpoints(target),
+            policy=settings.LB_POLICY,
+            eject_failures=settings.LB_EJECT_CONSECUTIVE_FAILURES,
+            eject_seconds=settings.LB_EJECT_SECONDS,
+            max_ejected_fraction=settings.LB_MAX_EJECTED_FRACTION,
+        )
+    return pool
+
+
+async def refresh_endpoints() -> None:
+    for target in (WORKER, EVALUATOR):
+        if not _target_settings(target)[2]:
+            continue
+        try:
+            get_pool(target).update(await _resolve_endpoints(target))
+        except OSError as e:
+            # Keep the last known endpoints
+            logger.warning("lb_dns_refresh_failed", extra={"target": target, "error": str(e)})
+
+
+async def run_endpoint_refresh(stop: asyncio.Event) -> None:
+    """Re-resolve DNS-discovered endpoints every LB_REFRESH_SECONDS until `stop` is set."""
+    interval = get_settings().LB_REFRESH_SECONDS
+    while not stop.is_set():
+        await refresh_endpoints()
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+@asynccontextmanager
+async def use_endpoint(target: str):
+    """Pick an endpoint for one call and feed its outcome back into the pool.
+
+    Raise inside the block (raise_for_status included) so 5xx responses
+    count as failures for passive ejection.
+    """
+    pool = get_pool(target)
+    endpoint = pool.pick()
+    endpoint.in_flight += 1
+    in_flight = LB_ENDPOINT_IN_FLIGHT.labels(target=target, endpoint=endpoint.base_url)
+    in_flight.inc()
+    start = time.monotonic()
+    error: Optional[BaseException] = None
+    try:
+        yield endpoint
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        endpoint.in_flight -= 1
+        in_flight.dec()
+        elapsed = time.monotonic() - start
+        # Cancelled (hedge loser), abandoned stream or spent request budget: no verdict on the endpoint
+        if not isinstance(error, (asyncio.CancelledError, GeneratorExit)) and not is_deadline_error(error):
+            # Same verdict as the circuit breaker, so ejection and breaker never disagree
+            ok = error is None or not is_failure(error)
+            pool.record(endpoint, ok, elapsed)
+            if error is None:
+                LB_ENDPOINT_LATENCY.labels(target=target, endpoint=endpoint.base_url).observe(elapsed)
@@ -0,0 +1,345 @@
+import time
+import uuid
+from dataclasses import replace
+from typing import AsyncIterator, Optional
+
+from services.common.config import get_settings
+from services.common.db import db_session
+from services.common.instrumentation import stage
+from services.common.log_sink import get_log_sink
+from services.common.logging_utils import setup_logger
+from services.common.metrics import REQUEST_COUNT, PIPELINE_LATENCY, REFINE_DECISIONS
+from services.common.models import ExecutionLog
+from services.common.schemas import RequestInput, RequestResponse, TokenUsage
+from services.manager.app.services import evaluation_queue, result_cache
+from services.manager.app.services.coalescer import get_single_flight, request_key
+from services.manager.app.services.evaluation_queue import (
+    EVAL_COMPLETED, EVAL_PENDING, EvaluationQueueFullError, get_evaluation_queue,
+)
+from services.manager.app.services.prompt_versions import get_active_prompt_version
+from services.manager.app.services.http_clients import WORKER
+from services.manager.app.services.resilience import shed_if_open
+from services.manager.app.services.refiner import DECISION_FUSED, refine_request
+from services.manager.app.services.stage_result import StageResult, elapsed_ms
+from services.manager.app.services.router import call_worker, call_worker_fused, call_evaluator, stream_worker
+
+logger = setup_logger("manager.pipeline")
+
+EVALUATION_INLINE = "inline"
+EVALUATION_DEFERRED = "deferred"
+
+
+def build_execution_log(
+    request_id: uuid.UUID, body: RequestInput, result: StageResult, total_latency_ms: Optional[int] = None,
+) -> ExecutionLog:
+    evaluation = result.evaluation
+    if evaluation is not None:
+        evaluation_detail = evaluation_queue.evaluation_detail(evaluation, result)
+    else:
+        # Deferred: the evaluation queue fills in score, passed and detail later
+        evaluation_detail = {**(result.refine_detail or {}), "evaluation_status": EVAL_PENDING}
+    if result.cache_source:
+        evaluation_detail["cached"] = result.cache_source
+    usage = result.total_usage()
+    return ExecutionLog(
+        request_id=request_id,
+        task_type=body.task_type,
+        user_input=body.user_input,
+        refined_input=result.refined_input,
+        prompt_version=result.prompt_version,
+        worker_output=result.worker_output,
+        worker_latency_ms=result.worker_latency_ms,
+        refine_latency_ms=result.refine_latency_ms,
+        worker_roundtrip_ms=result.worker_roundtrip_ms,
+        evaluator_roundtrip_ms=result.evaluator_roundtrip_ms,
+        rule_validation_ms=evaluation.detail.rule_latency_ms if evaluation else None,
+        total_latency_ms=total_latency_ms,
+        input_tokens=usage.input_tokens,
+        output_tokens=usage.output_tokens,
+        worker_input_tokens=result.worker_usage.input_tokens if result.worker_usage else None,
+        worker_output_tokens=result.worker_usage.output_tokens if result.worker_usage else None,
+        llm_cost_usd=usage.cost_usd,
+        evaluation_score=evaluation.score if evaluation else None,
+        evaluation_passed=evaluation.passed if evaluation else None,
+        evaluation_detail=evaluation_detail,
+    )
+
+
+def build_response(request_id: uuid.UUID, result: StageResult) -> RequestResponse:
+    evaluation = result.evaluation
+    return RequestResponse(
+        request_id=request_id,
+        refined_input=result.refined_input,
+        worker_output=result.worker_output,
+        evaluation_score=evaluation.score if evaluation else None,
+        evaluation_passed=evaluation.passed if evaluation else None,
+        evaluation_status=EVAL_COMPLETED if evaluation else EVAL_PENDING,
+        prompt_version=result.prompt_version,
+        cached=result.cache_source is not None,
+    )
+
+
+def build_error_log(request_id: uuid.UUID, body: RequestInput, error: Exception) -> ExecutionLog:
+    return ExecutionLog(
+        request_id=request_id,
+        task_type=body.task_type,
+        user_input=body.user_input,
+        error_message=str(error),
+    )
+
+
+async def save_logs(logs: list[ExecutionLog]) -> None:
+    """Hand logs to the write-behind sink, or insert them in one transaction if it isn't running."""
+    sink = get_log_sink()
+    if get_settings().LOG_SINK_ENABLED and sink.running:
+        for log in logs:
+            sink.submit(log)
+        return
+    with stage("manager", "db_write"):
+        async with db_session() as db:
+            db.add_all(logs)
+            await db.commit()
+
+
+async def save_error_log(request_id: uuid.UUID, body: RequestInput, error: Exception) -> None:
+    """Persist a failed run — wrapped so a DB failure doesn't mask the original error."""
+    try:
+        await save_logs([build_error_log(request_id, body, error)])
+    except Exception as log_err:
+        logger.error("error_log_save_failed", extra={
+            "request_id": str(request_id),
+            "log_error": str(log_err),
+        })
+
+
+def fused_enabled(task_type: str) -> bool:
+    fused = get_settings().FUSED_PIPELINE_TASK_TYPES
+    return task_type in {t.strip() for t in fused.split(",") if t.strip()}
+
+
+def evaluation_deferred() -> bool:
+    return get_settings().EVALUATION_MODE == EVALUATION_DEFERRED and get_evaluation_queue().running
+
+
+async def finish_evaluation(request_id: uuid.UUID, body: RequestInput, result: StageResult) -> StageResult:
+    """Queue a deferred evaluation for this request's row; evaluate inline if the queue is full."""
+    if result.evaluation is not None:
+        return result
+    try:
+        get_evaluation_queue().submit(request_id, body, result)
+        return result
+    except EvaluationQueueFullError:
+        logger.warning("evaluation_queue_full", extra={"request_id": str(request_id)})
+    start = time.perf_counter()
+    evaluation = await call_evaluator(
+        request_id, body.task_type, body.user_input, result.refined_input, result.worker_output,
+    )
+    return replace(
+        result, evaluation=evaluation, evaluator_roundtrip_ms=elapsed_ms(start), evaluator_usage=evaluation.usage,
+    )
+
+
+async def execute_stages(request_id: uuid.UUID, body: RequestInput) -> StageResult:
+    """Refine -> Worker -> Evaluate, without persisting."""
+    # Don't spend a refiner call on a request the worker breaker would reject anyway
+    shed_if_open(WORKER)
+    refine_latency_ms = None
+    refine_usage = None
+    if fused_enabled(body.task_type):
+        # Steps 1+2 in one worker LLM call; the worker returns the refined input too
+        start = time.perf_counter()
+        worker_result = await call_worker_fused(request_id, body.task_type, body.user_input)
+        worker_roundtrip_ms = elapsed_ms(start)
+        refined_input = worker_result.refined_input
+        refine_detail = {"refine_decision": DECISION_FUSED}
+        REFINE_DECISIONS.labels(task_type=body.task_type, decision=DECISION_FUSED).inc()
+    else:
+        # Step 1: Refine user input via LangChain
+        refinement = await refine_request(body.user_input, body.task_type)
+        refined_input = refinement.text
+        refine_latency_ms = refinement.latency_ms
+        refine_usage = refinement.usage
+        refine_detail = refinement.as_detail()
+        logger.info("request_refined", extra={"request_id": str(request_id), "decision": refinement.decision})
+
+        # Step 2: Call Worker
+        start = time.perf_counter()
+        worker_result = await call_worker(request_id, body.task_type, refined_input)
+        worker_roundtrip_ms = elapsed_ms(start)
+    logger.info("worker_completed", extra={
+        "request_id": str(request_id),
+        "prompt_version": worker_result.prompt_version,
+        "latency_ms": worker_result.latency_ms,
+    })
+
+    # Step 3: Call Evaluator, unless it runs after the response (deferred mode)
+    evaluator_roundtrip_ms = None
+    if evaluation_deferred():
+        eval_result = None
+    else:
+        start = time.perf_counter()
+        eval_result = await call_evaluator(
+            request_id, body.task_type, body.user_input, refined_input, worker_result.output,
+        )
+        evaluator_roundtrip_ms = elapsed_ms(start)
+        logger.info("evaluation_completed", extra={
+            "request_id": str(request_id),
+            "score": eval_result.score,
+            "passed": eval_result.passed,
+        })
+
+    return StageResult(
+        refined_input=refined_input,
+        prompt_version=worker_result.prompt_version,
+        worker_output=worker_result.output,
+        worker_latency_ms=worker_result.latency_ms,
+        evaluation=eval_result,
+        refine_detail=refine_detail,
+        refine_latency_ms=refine_latency_ms,
+        worker_roundtrip_ms=worker_roundtrip_ms,
+        evaluator_roundtrip_ms=evaluator_roundtrip_ms,
+        refine_usage=refine_usage,
+        worker_usage=worker_result.usage,
+        evaluator_usage=eval_result.usage if eval_result else None,
+    )
+
+
+async def execute_shared(request_id: uuid.UUID, body: RequestInput) -> StageResult:
+    """execute_stages behind the result cache and single-flight coalescing, when enabled.
+
+    Both are keyed by (task_type, normalized user_input, active prompt version);
+    each caller still gets its own request_id and log row.
+    """
+    settings = get_settings()
+    start = time.time()
+    source = "computed"
+
+    keyed = settings.COALESCE_ENABLED or settings.RESULT_CACHE_ENABLED
+    prompt_version = None
+    if keyed:
+        try:
+            prompt_version = await get_active_prompt_version(body.task_type)
+        except Exception as e:
+            # Without a version we can't tell duplicates apart safely — run uncached and uncoalesced
+            logger.warning("prompt_version_lookup_failed", extra={"request_id": str(request_id), "error": str(e)})
+            keyed = False
+
+    cached = None
+    if keyed and settings.RESULT_CACHE_ENABLED:
+        cached = await result_cache.lookup(body, prompt_version)
+
+    if cached is not None:
+        result, source = cached
+        logger.info("result_cache_hit", extra={"request_id": str(request_id), "source": source})
+        # No stage ran for this request
+        result = replace(
+            result, cache_source=source, refine_detail=None,
+            refine_latency_ms=None, worker_roundtrip_ms=None, evaluator_roundtrip_ms=None,
+            refine_usage=None, worker_usage=None, evaluator_usage=None,
+        )
+    elif keyed and settings.COALESCE_ENABLED:
+        key = request_key(body.task_type, body.user_input, prompt_version)
+        result, leader = await get_single_flight().do(
+            key, lambda: execute_stages(request_id, body), label=body.task_type,
+        )
+        if not leader:
+            # The leader's row bills these LLM calls; joiners would count them again
+            result = replace(result, refine_usage=None, worker_usage=None, evaluator_usage=None)
+    else:
+        result = await execute_stages(request_id, body)
+
+    if keyed and settings.RESULT_CACHE_ENABLED and cached is None:
+        result_cache.store(body, prompt_version, result)
+
+    PIPELINE_LATENCY.labels(task_type=body.task_type, source=source).observe(time.time() - start)
+    return result
+
+
+async def run_pipeline(request_id: uuid.UUID, body: RequestInput) -> RequestResponse:
+    """Refine -> Worker -> Evaluate -> persist. Raises after logging the failure."""
+    start = time.perf_counter()
+    try:
+        result = await execute_shared(request_id, body)
+        result = await finish_evaluation(request_id, body, result)
+
+        # Step 4: Save execution log
+        await save_logs([build_execution_log(request_id, body, result, total_latency_ms=elapsed_ms(start))])
+
+        REQUEST_COUNT.labels(service="manager", task_type=body.task_type, status="success").inc()
+        return build_response(request_id, result)
+
+    except Exception as e:
+        REQUEST_COUNT.labels(service="manager", task_type=body.task_type, status="error").inc()
+        logger.error("request_failed", extra={"request_id": str(request_id), "error": str(e)})
+        await save_error_log(request_id, body, e)
+        raise
+
+
+async def stream_pipeline(request_id: uuid.UUID, body: RequestInput) -> AsyncIterator[tuple[str, dict]]:
+    """Streaming pipeline. Yields (event, data) as each stage completes.
+
+    Events: ``refined``, ``token`` (worker deltas), ``worker_done``,
+    ``evaluated``, and ``error`` if any stage fails.
+    """
+    rid = str(request_id)
+    start = time.perf_counter()
+    try:
+        refinement = await refine_request(body.user_input, body.task_type)
+        refined_input = refinement.text
+        logger.info("request_refined", extra={"request_id": rid, "decision": refinement.decision})
+        yield "refined", {"request_id": rid, "refined_input": refined_input, "decision": refinement.decision}
+
+        chunks: list[str] = []
+        prompt_version, latency_ms, worker_usage = None, None, None
+        worker_start = time.perf_counter()
+        async for event in stream_worker(request_id, body.task_type, refined_input):
+            if event["type"] == "delta":
+                chunks.append(event["text"])
+                yield "token", {"text": event["text"]}
+            elif event["type"] == "done":
+                prompt_version, latency_ms = event["prompt_version"], event["latency_ms"]
+                worker_usage = TokenUsage(**event.get("usage", {}))
+        if prompt_version is None:
+            raise RuntimeError("Worker stream ended without a done event")
+        worker_output = "".join(chunks)
+        worker_roundtrip_ms = elapsed_ms(worker_start)
+        logger.info("worker_completed", extra={
+            "request_id": rid,
+            "prompt_version": prompt_version,
+            "latency_ms": latency_ms,
+        })
+        yield "worker_done", {"request_id": rid, "prompt_version": prompt_version, "latency_ms": latency_ms}
+
+        evaluator_start = time.perf_counter()
+        eval_result = await call_evaluator(
+            request_id, body.task_type, body.user_input, refined_input, worker_output,
+        )
+        evaluator_roundtrip_ms = elapsed_ms(evaluator_start)
+        logger.info("evaluation_completed", extra={
+            "request_id": rid,
+            "score": eval_result.score,
+            "passed": eval_result.passed,
+        })
+
+        await save_logs([build_execution_log(request_id, body, StageResult(
+            refined_input=refined_input,
+            prompt_version=prompt_version,
+            worker_output=worker_output,
+            worker_latency_ms=latency_ms,
+            evaluation=eval_result,
+            refine_detail=refinement.as_detail(),
+            refine_latency_ms=refinement.latency_ms,
+            worker_roundtrip_ms=worker_roundtrip_ms,
+            evaluator_roundtrip_ms=evaluator_roundtrip_ms,
+            refine_usage=refinement.usage,
+            worker_usage=worker_usage,
+            evaluator_usage=eval_result.usage,
+        ), total_latency_ms=elapsed_ms(start))])
+        REQUEST_COUNT.labels(service="manager", task_type=body.task_type, status="success").inc()
+        yield "evaluated", {"request_id": rid, "score": eval_result.score, "passed": eval_result.passed}
+
+    except Exception as e:
+        REQUEST_COUNT.labels(service="manager", task_type=body.task_type, status="error").inc()
+        logger.error("request_failed", extra={"request_id": rid, "error": str(e)})
+        await save_error_log(request_id, body, e)
+        yield "error", {"request_id": rid, "detail": str(e)}
@@ -0,0 +1,55 @@
+import asyncio
+from typing import Optional
+
+from sqlalchemy import select, func
+
+from services.common.config import get_settings
+from services.common.db import db_session
+from services.common.logging_utils import setup_logger
+from services.common.lru import LRUCache
+from services.common.models import Prompt
+from services.common.prompt_notify import listen_prompt_channel
+
+logger = setup_logger("manager.prompt_versions")
+
+_versions: Optional[LRUCache] = None
+# Bumped on every invalidation so a lookup that raced a NOTIFY is not cached
+_generation = 0
+
+
+def _get_cache() -> LRUCache:
+    global _versions
+    if _versions is None:
+        _versions = LRUCache(256, ttl_seconds=get_settings().PROMPT_CACHE_TTL_SECONDS)
+    return _versions
+
+
+def invalidate(task_type: Optional[str] = None, reason: str = "notify") -> None:
+    global _generation
+    _generation += 1
+    if task_type is None:
+        _get_cache().clear()
+    else:
+        _get_cache().pop(task_type)
+    logger.info("prompt_version_invalidated", extra={"task_type": task_type, "reason": reason})
+
+
+async def get_active_prompt_version(task_type: str) -> Optional[int]:
+    """Active prompt version for a task type, cached and invalidated via prompt NOTIFY."""
+    cache = _get_cache()
+    version = cache.get(task_type)
+    if version is not None:
+        return version
+
+    generation = _generation
+    async with db_session() as db:
+        version = await db.scalar(
+            select(func.max(Prompt.version)).where(Prompt.task_type == task_type, Prompt.is_active == True)
+        )
+    if version is not None and generation == _generation:
+        cache.set(task_type, version)
+    return version
+
+
+async def listen_for_prompt_changes(stop: asyncio.Event) -> None:
+    await listen_prompt_channel(stop, invalidate)
@@ -0,0 +1,93 @@
+import json
+import math
+import re
+from typing import Optional
+
+from services.common.config import get_settings
+from services.common.logging_utils import setup_logger
+
+logger = setup_logger("manager.refine_gate")
+
+_REQUIREMENT_WORDS = re.compile(
+    r"\b(must|should|shall|return|returns|raise|raises|handle|handles|validate|input|output|"
+    r"parameter|parameters|argument|arguments|example|edge case|type hint|list|dict|int|str|float|bool)\b",
+    re.IGNORECASE,
+)
+_VAGUE_WORDS = re.compile(r"\b(something|stuff|thing|things|somehow|maybe|etc|whatever|some kind of)\b", re.IGNORECASE)
+_CODE_LIKE = re.compile(r"`|\bdef\s+\w+|\w+\([^)]*\)|->|\b[a-z]+_[a-z_]+\b|[{}\[\]]")
+_LIST_ITEM = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+", re.MULTILINE)
+_NUMBER = re.compile(r"\d")
+
+# Hand-set weights for the default model: a short or vague request needs refining.
+# A long one with explicit requirements or code-like structure does not.
+DEFAULT_MODEL = {
+    "bias": -4.0,
+    "weights": {
+        "length": 1.5,
+        "requirements": 2.5,
+        "code_like": 1.5,
+        "structure": 1.0,
+        "numbers": 0.5,
+        "vague": -2.0,
+    },
+}
+
+FEATURES = list(DEFAULT_MODEL["weights"])
+
+
+def extract_features(user_input: str) -> dict[str, float]:
+    """Deterministic features of a raw request, each roughly in [0, 3]."""
+    words = len(user_input.split())
+    return {
+        "length": min(words / 50.0, 3.0),
+        "requirements": min(len(_REQUIREMENT_WORDS.findall(user_input)) / 5.0, 1.0),
+        "code_like": min(len(_CODE_LIKE.findall(user_input)) / 3.0, 1.0),
+        "structure": min(len(_LIST_ITEM.findall(user_input)) / 3.0, 1.0),
+        "numbers": 1.0 if _NUMBER.search(user_input) else 0.0,
+        "vague": min(len(_VAGUE_WORDS.findall(user_input)) / 2.0, 1.0),
+    }
+
+
+class RefineGate:
+    """Logistic classifier over extract_features: P(refinement is not needed).
+
+    Uses DEFAULT_MODEL unless a model file is given. The file is JSON
+    ``{"bias": float, "weights": {feature: float}}`` as written by
+    ``scripts/train_refine_gate.py``.
+    """
+
+    def __init__(self, threshold: float, model: Optional[dict] = None):
+        model = model or DEFAULT_MODEL
+        self.threshold = threshold
+        self.bias = float(model["bias"])
+        self.weights = {name: float(model["weights"].get(name, 0.0)) for name in FEATURES}
+
+    def score(self, user_input: str) -> float:
+        features = extract_features(user_input)
+        z = self.bias + sum(self.weights[name] * value for name, value in features.items())
+        return 1.0 / (1.0 + math.exp(-z))
+
+    def should_bypass(self, user_input: str) -> tuple[bool, float]:
+        p = self.score(user_input)
+        return p >= self.threshold, p
+
+
+def _load_model(path: str) -> Optional[dict]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("refine_gate_model_load_failed", extra={"path": path, "error": str(e)})
+        return None
+
+
+_gate: Optional[RefineGate] = None
+
+
+def get_refine_gate() -> RefineGate:
+    global _gate
+    if _gate is None:
+        settings = get_settings()
+        model = _load_model(settings.REFINE_GATE_MODEL_PATH) if settings.REFINE_GATE_MODEL_PATH else None
+        _gate = RefineGate(settings.REFINE_GATE_THRESHOLD, model)
+    return _gate
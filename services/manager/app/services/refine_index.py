@@ -0,0 +1,205 @@
+import re
+import zlib
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import select
+
+from services.common.config import get_settings
+from services.common.db import db_session
+from services.common.logging_utils import setup_logger
+from services.common.metrics import REFINE_INDEX_REQUESTS, REFINE_INDEX_SIZE, REFINE_INDEX_SIMILARITY
+from services.common.models import ExecutionLog
+
+logger = setup_logger("manager.refine_index")
+
+_WHITESPACE = re.compile(r"\s+")
+_WORD = re.compile(r"\w+")
+
+# refiner.DECISION_LLM; not imported because the refiner imports this module
+_DECISION_LLM = "llm"
+
+# Ignored when comparing content words, so phrasing-only differences still match
+_STOPWORDS = frozenset({
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "with", "by", "from", "as", "at",
+    "is", "are", "be", "it", "its", "that", "this", "these", "those", "which",
+    "i", "me", "my", "we", "you", "your", "please", "can", "could", "would", "should", "will",
+    "write", "create", "make", "implement", "generate", "give", "show", "need", "want", "how",
+    "code", "program", "script",
+})
+
+# Words that flip the meaning of a request whose other words match
+_NEGATIONS = frozenset({"not", "no", "without", "never", "don", "dont", "doesn", "except", "excluding", "avoid"})
+_ANTONYMS = (
+    ("ascending", "descending"), ("asc", "desc"), ("increasing", "decreasing"),
+    ("max", "min"), ("maximum", "minimum"), ("largest", "smallest"), ("biggest", "smallest"),
+    ("highest", "lowest"), ("longest", "shortest"), ("first", "last"), ("even", "odd"),
+    ("upper", "lower"), ("uppercase", "lowercase"), ("left", "right"), ("before", "after"),
+    ("encode", "decode"), ("encrypt", "decrypt"), ("compress", "decompress"),
+    ("serialize", "deserialize"), ("add", "remove"), ("insert", "delete"), ("push", "pop"),
+)
+
+
+def _stem(word: str) -> str:
+    """Crude suffix stripping so "sorts", "sorted" and "sorting" compare equal."""
+    for suffix in ("ing", "ed", "es", "s"):
+        if word.endswith(suffix) and not word.endswith("ss") and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            break
+    return word[:-1] if word.endswith("e") and len(word) > 3 else word
+
+
+def content_words(text: str) -> frozenset[str]:
+    return frozenset(w for w in _WORD.findall(text.lower()) if w not in _STOPWORDS)
+
+
+def word_overlap(a: frozenset[str], b: frozenset[str]) -> float:
+    """Jaccard overlap of two content-word sets, compared by stem."""
+    a, b = {_stem(w) for w in a}, {_stem(w) for w in b}
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def conflicting(a: frozenset[str], b: frozenset[str]) -> bool:
+    """True when only one side is negated, or the two differ by an antonym pair."""
+    if (a & _NEGATIONS) != (b & _NEGATIONS):
+        return True
+    only_a, only_b = a - b, b - a
+    return any((x in only_a and y in only_b) or (y in only_a and x in only_b) for x, y in _ANTONYMS)
+
+
+class RefinementIndex:
+    """Near-duplicate lookup of past (user_input -> refined_input) pairs.
+
+    Inputs are embedded as L2-normalised hashed character n-gram vectors
+    (signed feature hashing), so cosine similarity is a dot product. The
+    vectors sit in a preallocated float32 matrix of ``max_entries x dim``.
+    Memory is therefore fixed; once full, the least recently used row is
+    overwritten.
+
+    Character n-grams rate near-opposite requests ("ascending" vs
+    "descending", "max" vs "min") as highly similar, and rephrasings of one
+    request as fairly dissimilar. So the cosine ``threshold`` only selects
+    candidates. A candidate is reused when its content words overlap the
+    input's by at least ``min_word_overlap`` (Jaccard), and the two do not
+    conflict on negation or an antonym pair.
+    """
+
+    def __init__(self, dim: int, max_entries: int, threshold: float, min_word_overlap: float, ngram: int = 3):
+        self.dim = dim
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.min_word_overlap = min_word_overlap
+        self.ngram = ngram
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self._last_used = np.zeros(max_entries, dtype=np.int64)
+        self._task_types: list[Optional[str]] = [None] * max_entries
+        self._refined: list[Optional[str]] = [None] * max_entries
+        self._words: list[Optional[frozenset[str]]] = [None] * max_entries
+        self._size = 0
+        self._clock = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _vectorize(self, text: str) -> np.ndarray:
+        text = f" {_WHITESPACE.sub(' ', text.lower()).strip()} "
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for i in range(max(len(text) - self.ngram + 1, 1)):
+            h = zlib.crc32(text[i:i + self.ngram].encode("utf-8"))
+            vec[h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm > 0 else vec
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    def lookup(self, task_type: str, user_input: str) -> Optional[tuple[str, float]]:
+        """Best stored refinement for this task_type at or above the threshold, with its similarity."""
+        if self._size == 0:
+            return None
+        sims = self._vectors[:self._size] @ self._vectorize(user_input)
+        mask = np.fromiter((t == task_type for t in self._task_types[:self._size]), dtype=bool, count=self._size)
+        sims = np.where(mask, sims, -1.0)
+        candidates = np.flatnonzero(sims >= self.threshold)
+        if candidates.size == 0:
+            return None
+        words = content_words(user_input)
+        for slot in candidates[np.argsort(-sims[candidates])]:
+            stored = self._words[slot]
+            if word_overlap(stored, words) >= self.min_word_overlap and not conflicting(stored, words):
+                self._last_used[slot] = self._tick()
+                return self._refined[slot], float(sims[slot])
+        return None
+
+    def add(self, task_type: str, user_input: str, refined_input: str) -> None:
+        if self._size < self.max_entries:
+            slot = self._size
+            self._size += 1
+        else:
+            slot = int(np.argmin(self._last_used))
+        self._vectors[slot] = self._vectorize(user_input)
+        self._task_types[slot] = task_type
+        self._refined[slot] = refined_input
+        self._words[slot] = content_words(user_input)
+        self._last_used[slot] = self._tick()
+        REFINE_INDEX_SIZE.set(self._size)
+
+
+_index: Optional[RefinementIndex] = None
+
+
+def get_refine_index() -> RefinementIndex:
+    global _index
+    if _index is None:
+        settings = get_settings()
+        _index = RefinementIndex(
+            dim=settings.REFINE_INDEX_DIM,
+            max_entries=settings.REFINE_INDEX_MAX_ENTRIES,
+            threshold=settings.REFINE_INDEX_THRESHOLD,
+            min_word_overlap=settings.REFINE_INDEX_MIN_WORD_OVERLAP,
+        )
+    return _index
+
+
+def lookup_refinement(task_type: str, user_input: str) -> Optional[str]:
+    match = get_refine_index().lookup(task_type, user_input)
+    if match is None:
+        REFINE_INDEX_REQUESTS.labels(task_type=task_type, result="miss").inc()
+        return None
+    refined, similarity = match
+    REFINE_INDEX_REQUESTS.labels(task_type=task_type, result="hit").inc()
+    REFINE_INDEX_SIMILARITY.observe(similarity)
+    logger.info("refine_index_hit", extra={"task_type": task_type, "similarity": round(similarity, 4)})
+    return refined
+
+
+async def warm_up_refine_index() -> None:
+    """Seed the index from recent passing rows whose refinement came from the refiner LLM.
+
+    Bypassed, deadline-fallback and fused rows are skipped: their refined_input
+    is the raw input or the worker's, not a refinement worth reusing.
+    """
+    index = get_refine_index()
+    stmt = (
+        select(ExecutionLog.task_type, ExecutionLog.user_input, ExecutionLog.refined_input)
+        .where(
+            ExecutionLog.evaluation_passed == True,
+            ExecutionLog.refined_input.isnot(None),
+            ExecutionLog.evaluation_detail["refine_decision"].as_string() == _DECISION_LLM,
+        )
+        .order_by(ExecutionLog.created_at.desc())
+        .limit(index.max_entries)
+    )
+    try:
+        async with db_session() as db:
+            rows = (await db.execute(stmt)).all()
+    except Exception as e:
+        logger.warning("refine_index_warm_up_failed", extra={"error": str(e)})
+        return
+    # Oldest first so the newest rows end up most recently used
+    for task_type, user_input, refined_input in reversed(rows):
+        index.add(task_type, user_input, refined_input)
+    logger.info("refine_index_warmed_up", extra={"entries": len(index)})
@@ -1,11 +1,86 @@
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
 from services.manager.app.agents.manager_agent import build_refiner_chain
+from services.manager.app.services.refine_gate import get_refine_gate
+from services.manager.app.services.refine_index import get_refine_index, lookup_refinement
+from services.common.config import get_settings
+from services.common.deadline import DeadlineExceeded, record_fallback, with_deadline
+from services.common.instrumentation import stage, track_usage
 from services.common.logging_utils import setup_logger
+from services.common.metrics import REFINE_DECISIONS, REFINE_LATENCY
+from services.common.schemas import TokenUsage
 
 logger = setup_logger("manager.refiner")
 
+DECISION_BYPASSED = "bypassed"
+DECISION_INDEX = "index"
+DECISION_LLM = "llm"
+# Refiner ran past its share of the request deadline; the raw input is used
+DECISION_FALLBACK = "deadline_fallback"
+# Refined by the worker in the same call as generation (fused pipeline mode)
+DECISION_FUSED = "fused"
+
+
+@dataclass
+class Refinement:
+    text: str
+    # How the text was produced: bypassed (raw input), index (near-duplicate), llm or deadline_fallback
+    decision: str
+    latency_ms: int
+    gate_score: Optional[float] = None
+    # Zero unless the refiner LLM ran
+    usage: TokenUsage = field(default_factory=TokenUsage)
+
+    def as_detail(self) -> dict:
+        detail = {"refine_decision": self.decision, "refine_latency_ms": self.latency_ms}
+        if self.decision == DECISION_FALLBACK:
+            detail["fallbacks"] = ["refine_deadline"]
+        if self.gate_score is not None:
+            detail["refine_gate_score"] = round(self.gate_score, 4)
+        return detail
+
+
+async def _refine(user_input: str, task_type: str) -> tuple[str, str, Optional[float]]:
+    settings = get_settings()
+    gate_score = None
+    if settings.REFINE_GATE_ENABLED:
+        bypass, gate_score = get_refine_gate().should_bypass(user_input)
+        if bypass:
+            return user_input, DECISION_BYPASSED, gate_score
+
+    if settings.REFINE_INDEX_ENABLED:
+        refined = lookup_refinement(task_type, user_input)
+        if refined is not None:
+            return refined, DECISION_INDEX, gate_score
 
-async def refine_request(user_input: str, task_type: str) -> str:
     chain = build_refiner_chain()
-    refined = await chain.ainvoke({"user_input": user_input, "task_type": task_type})
+    try:
+        with stage("manager", "refine_llm"):
+            refined = await with_deadline(
+                chain.ainvoke({"user_input": user_input, "task_type": task_type}),
+                share=settings.REFINE_DEADLINE_SHARE,
+            )
+    except DeadlineExceeded:
+        # Late refiner: go ahead with the raw input rather than eat the worker's budget
+        record_fallback("manager", "refine")
+        logger.warning("refine_deadline_fallback", extra={"task_type": task_type})
+        return user_input, DECISION_FALLBACK, gate_score
     logger.info("refined_request", extra={"original": user_input[:100], "refined": refined[:100]})
-    return refined
+    if settings.REFINE_INDEX_ENABLED:
+        get_refine_index().add(task_type, user_input, refined)
+    return refined, DECISION_LLM, gate_score
+
+
+@stage("manager", "refine")
+async def refine_request(user_input: str, task_type: str) -> Refinement:
+    start = time.perf_counter()
+    with track_usage(task_type) as usage:
+        text, decision, gate_score = await _refine(user_input, task_type)
+    elapsed = time.perf_counter() - start
+    REFINE_DECISIONS.labels(task_type=task_type, decision=decision).inc()
+    REFINE_LATENCY.labels(decision=decision).observe(elapsed)
+    return Refinement(
+        text=text, decision=decision, latency_ms=int(elapsed * 1000), gate_score=gate_score, usage=usage,
+    )
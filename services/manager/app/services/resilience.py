@@ -0,0 +1,267 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import httpx
+
+from services.common.config import get_settings
+from services.common.deadline import is_deadline_error, remaining
+from services.common.logging_utils import setup_logger
+from services.common.metrics import (
+    CIRCUIT_STATE, CIRCUIT_TRANSITIONS, CIRCUIT_REJECTIONS, RETRIES_TOTAL,
+)
+
+logger = setup_logger("manager.resilience")
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Statuses that mean "overloaded or not reachable", not "bad request". 504 is
+# left out: the callee ran out of budget, and a resend would too.
+_RETRYABLE_STATUSES = {502, 503}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the target while its circuit breaker is open."""
+
+    def __init__(self, target: str, retry_after: float):
+        super().__init__(f"{target.capitalize()} circuit open; retry in {retry_after:.0f}s")
+        self.target = target
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker for one downstream target.
+
+    Closed: calls pass; outcomes are kept for ``window_seconds``. Once the
+    window holds at least ``min_calls`` and the failure rate reaches
+    ``failure_rate``, the breaker opens. Open: calls fail fast for
+    ``open_seconds``. Half-open: up to ``half_open_calls`` probes pass; if
+    they all succeed the breaker closes, and any failure reopens it.
+    """
+
+    def __init__(
+        self,
+        target: str,
+        failure_rate: float,
+        window_seconds: float,
+        min_calls: int,
+        open_seconds: float,
+        half_open_calls: int,
+    ):
+        self.target = target
+        self.failure_rate = failure_rate
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.state = CLOSED
+        self._outcomes: deque[tuple[float, bool]] = deque()
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        CIRCUIT_STATE.labels(target=target).set(_STATE_VALUES[CLOSED])
+
+    def _transition(self, state: str) -> None:
+        logger.warning("circuit_state_changed", extra={"target": self.target, "from": self.state, "to": state})
+        self.state = state
+        CIRCUIT_STATE.labels(target=self.target).set(_STATE_VALUES[state])
+        CIRCUIT_TRANSITIONS.labels(target=self.target, state=state).inc()
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        elif state == HALF_OPEN:
+            self._probes = self._probe_successes = 0
+        else:
+            self._outcomes.clear()
+
+    def retry_after(self) -> float:
+        return max(self._opened_at + self.open_seconds - time.monotonic(), 0.0)
+
+    def is_open(self) -> bool:
+        """True while calls would be rejected outright; does not take a half-open probe slot."""
+        return self.state == OPEN and self.retry_after() > 0
+
+    def allow(self) -> None:
+        """Admit one call, or raise CircuitOpenError."""
+        if self.state == OPEN:
+            if self.retry_after() > 0:
+                CIRCUIT_REJECTIONS.labels(target=self.target).inc()
+                raise CircuitOpenError(self.target, self.retry_after())
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._probes >= self.half_open_calls:
+                CIRCUIT_REJECTIONS.labels(target=self.target).inc()
+                raise CircuitOpenError(self.target, self.open_seconds)
+            self._probes += 1
+
+    def release(self) -> None:
+        """Give back a half-open probe slot whose call was cancelled before it finished."""
+        if self.state == HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def record(self, ok: bool) -> None:
+        if self.state == HALF_OPEN:
+            if not ok:
+                self._transition(OPEN)
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_calls:
+                self._transition(CLOSED)
+            return
+        if self.state == OPEN:
+            # A call admitted before the breaker opened finished late
+            return
+
+        now = time.monotonic()
+        self._outcomes.append((now, ok))
+        while self._outcomes and self._outcomes[0][0] < now - self.window_seconds:
+            self._outcomes.popleft()
+        failures = sum(1 for _, success in self._outcomes if not success)
+        if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+            self._transition(OPEN)
+
+
+class RetryBudget:
+    """Caps retries at ``ratio`` of first attempts within a sliding window.
+
+    Shared by every target, so retries can add at most ``ratio`` extra load
+    no matter how many calls are failing (plus ``min_retries`` per window, so
+    a quiet replica can still retry).
+    """
+
+    def __init__(self, ratio: float, window_seconds: float, min_retries: int):
+        self.ratio = ratio
+        self.window_seconds = window_seconds
+        self.min_retries = min_retries
+        self._requests: deque[float] = deque()
+        self._retries: deque[float] = deque()
+
+    def _prune(self, now: float) -> None:
+        cutoff = now - self.window_seconds
+        for events in (self._requests, self._retries):
+            while events and events[0] < cutoff:
+                events.popleft()
+
+    def record_request(self) -> None:
+        now = time.monotonic()
+        self._prune(now)
+        self._requests.append(now)
+
+    def try_retry(self) -> bool:
+        now = time.monotonic()
+        self._prune(now)
+        if len(self._retries) >= max(self.min_retries, self.ratio * len(self._requests)):
+            return False
+        self._retries.append(now)
+        return True
+
+
+def is_retryable(error: Exception) -> bool:
+    """Failures where the request never reached an LLM call, so resending is safe and cheap."""
+    if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return True
+    return isinstance(error, httpx.HTTPStatusError) and error.response.status_code in _RETRYABLE_STATUSES
+
+
+def is_failure(error: Exception) -> bool:
+    """Failures that count against the breaker: transport errors and 5xx, not 4xx."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_budget: Optional[RetryBudget] = None
+
+
+def get_breaker(target: str) -> CircuitBreaker:
+    breaker = _breakers.get(target)
+    if breaker is None:
+        settings = get_settings()
+        breaker = _breakers[target] = CircuitBreaker(
+            target,
+            failure_rate=settings.CIRCUIT_FAILURE_RATE,
+            window_seconds=settings.CIRCUIT_WINDOW_SECONDS,
+            min_calls=settings.CIRCUIT_MIN_CALLS,
+            open_seconds=settings.CIRCUIT_OPEN_SECONDS,
+            half_open_calls=settings.CIRCUIT_HALF_OPEN_CALLS,
+        )
+    return breaker
+
+
+def shed_if_open(target: str) -> None:
+    """Fail fast before doing upstream work (e.g. refinement) for a target that is shedding load."""
+    breaker = get_breaker(target)
+    if breaker.is_open():
+        CIRCUIT_REJECTIONS.labels(target=target).inc()
+        raise CircuitOpenError(target, breaker.retry_after())
+
+
+def get_retry_budget() -> RetryBudget:
+    global _budget
+    if _budget is None:
+        settings = get_settings()
+        _budget = RetryBudget(
+            ratio=settings.RETRY_BUDGET_RATIO,
+            window_seconds=settings.RETRY_BUDGET_WINDOW_SECONDS,
+            min_retries=settings.RETRY_BUDGET_MIN_RETRIES,
+        )
+    return _budget
+
+
+def _backoff(attempt: int) -> float:
+    settings = get_settings()
+    # Full jitter: uniform over [0, base * 2^attempt], capped
+    return random.uniform(0, min(settings.RETRY_BACKOFF_MAX_SECONDS, settings.RETRY_BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+async def call_with_resilience(target: str, call: Callable[[], Awaitable[T]]) -> T:
+    """Run `call` behind the target's breaker, retrying retryable failures within the budget.
+
+    `call` must raise httpx errors (raise_for_status included) for the
+    breaker and retry policy to see them.
+    """
+    settings = get_settings()
+    breaker = get_breaker(target)
+    budget = get_retry_budget()
+    budget.record_request()
+    attempt = 0
+    while True:
+        breaker.allow()
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception as e:
+            if is_deadline_error(e):
+                # The request budget ran out: no verdict on the target either way
+                breaker.release()
+            else:
+                breaker.record(not is_failure(e))
+            if attempt >= settings.RETRY_MAX_ATTEMPTS - 1 or not is_retryable(e):
+                raise
+            delay = _backoff(attempt)
+            left = remaining()
+            if left is not None and delay >= left:
+                RETRIES_TOTAL.labels(target=target, result="deadline").inc()
+                raise
+            if not budget.try_retry():
+                RETRIES_TOTAL.labels(target=target, result="budget_exhausted").inc()
+                raise
+            RETRIES_TOTAL.labels(target=target, result="retried").inc()
+            logger.warning("downstream_retry", extra={
+                "target": target, "attempt": attempt + 1, "delay_ms": int(delay * 1000), "error": str(e),
+            })
+            attempt += 1
+            await asyncio.sleep(delay)
+            continue
+        breaker.record(True)
+        return result
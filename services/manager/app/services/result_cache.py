@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import func, select
+
+from services.common.config import get_settings
+from services.common.db import db_session
+from services.common.logging_utils import setup_logger
+from services.common.lru import LRUCache
+from services.common.metrics import RESULT_CACHE_REQUESTS
+from services.common.models import ExecutionLog
+from services.common.schemas import RequestInput, EvaluateOutput, EvaluationDetail
+from services.manager.app.services.coalescer import normalize_input, request_key
+from services.manager.app.services.stage_result import StageResult
+
+logger = setup_logger("manager.result_cache")
+
+SOURCE_MEMORY = "memory"
+SOURCE_DB = "db"
+
+_cache: Optional[LRUCache] = None
+
+
+def _get_cache() -> LRUCache:
+    global _cache
+    if _cache is None:
+        settings = get_settings()
+        _cache = LRUCache(settings.RESULT_CACHE_MAX_ENTRIES, ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS)
+    return _cache
+
+
+def _normalized(column):
+    """SQL twin of coalescer.normalize_input: whitespace runs collapsed to one space, then trimmed."""
+    return func.btrim(func.regexp_replace(column, r"\s+", " ", "g"), " ")
+
+
+async def _lookup_db(body: RequestInput, prompt_version: int):
+    """Most recent passing row for the same input under the same prompt version.
+
+    Inputs are compared whitespace-normalized, matching the in-memory key.
+    """
+    settings = get_settings()
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.RESULT_CACHE_DB_MAX_AGE_SECONDS)
+    stmt = (
+        select(ExecutionLog)
+        .where(
+            ExecutionLog.task_type == body.task_type,
+            ExecutionLog.prompt_version == prompt_version,
+            _normalized(ExecutionLog.user_input) == normalize_input(body.user_input),
+            ExecutionLog.evaluation_passed == True,
+            # Degraded runs (deadline fallbacks) must not be served to full-budget requests
+            func.coalesce(ExecutionLog.evaluation_detail["fallbacks"].as_string(), "[]") == "[]",
+            ExecutionLog.error_message.is_(None),
+            ExecutionLog.created_at >= cutoff,
+        )
+        .order_by(ExecutionLog.created_at.desc())
+        .limit(1)
+    )
+    async with db_session() as db:
+        result = await db.execute(stmt)
+        return result.scalar_one_or_none()
+
+
+async def lookup(body: RequestInput, prompt_version: Optional[int]) -> Optional[tuple[StageResult, str]]:
+    """Return (StageResult, source) for a cached passing result, or None.
+
+    The key includes the active prompt version, so a prompt patch makes every
+    older entry unreachable immediately; stale entries then age out by TTL/LRU.
+    """
+    if prompt_version is None:
+        return None
+    key = request_key(body.task_type, body.user_input, prompt_version)
+    result = _get_cache().get(key)
+    if result is not None:
+        RESULT_CACHE_REQUESTS.labels(task_type=body.task_type, result="hit_memory").inc()
+        return result, SOURCE_MEMORY
+
+    if get_settings().RESULT_CACHE_DB_LOOKUP:
+        try:
+            row = await _lookup_db(body, prompt_version)
+        except Exception as e:
+            logger.warning("result_cache_db_lookup_failed", extra={"error": str(e)})
+            row = None
+        if row is not None and row.evaluation_detail:
+            detail = {k: v for k, v in row.evaluation_detail.items() if k in EvaluationDetail.model_fields}
+            result = StageResult(
+                refined_input=row.refined_input,
+                prompt_version=row.prompt_version,
+                worker_output=row.worker_output,
+                worker_latency_ms=row.worker_latency_ms,
+                evaluation=EvaluateOutput(
+                    request_id=row.request_id,
+                    score=row.evaluation_score,
+                    passed=row.evaluation_passed,
+                    detail=EvaluationDetail(**detail),
+                ),
+            )
+            _get_cache().set(key, result)
+            RESULT_CACHE_REQUESTS.labels(task_type=body.task_type, result="hit_db").inc()
+            return result, SOURCE_DB
+
+    RESULT_CACHE_REQUESTS.labels(task_type=body.task_type, result="miss").inc()
+    return None
+
+
+def _degraded(result: StageResult) -> bool:
+    """A stage fell back under the request deadline (raw input used, or a rules-only score)."""
+    return bool(result.evaluation.detail.fallbacks or (result.refine_detail or {}).get("fallbacks"))
+
+
+def store(body: RequestInput, prompt_version: Optional[int], result: StageResult) -> None:
+    """Cache full-quality passing results only.
+
+    A failed, not yet evaluated or deadline-degraded output is recomputed on
+    retry, so one short-budget client can't pin a degraded answer for others.
+    """
+    if prompt_version is None or result.evaluation is None or not result.evaluation.passed:
+        return
+    if _degraded(result):
+        return
+    # The worker may have picked up a newer prompt than the one we looked up
+    if result.prompt_version != prompt_version:
+        return
+    _get_cache().set(request_key(body.task_type, body.user_input, prompt_version), result)
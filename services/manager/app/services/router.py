@@ -1,26 +1,91 @@
+import json
+from typing import AsyncIterator
 from uuid import UUID
 
 import httpx
 
 from services.common.config import get_settings
+from services.common.deadline import deadline_headers, is_deadline_error, remaining
+from services.common.instrumentation import stage
 from services.common.logging_utils import setup_logger
-from services.common.schemas import TaskInput, TaskOutput, EvaluateInput, EvaluateOutput, EvaluationDetail
+from services.common.schemas import (
+    TaskInput, TaskOutput, FusedTaskInput, FusedTaskOutput, EvaluateInput, EvaluateOutput, EvaluationDetail,
+)
+from services.manager.app.services.hedging import maybe_hedge
+from services.manager.app.services.http_clients import WORKER, EVALUATOR, get_client, track_request
+from services.manager.app.services.load_balancer import use_endpoint
+from services.manager.app.services.resilience import call_with_resilience, get_breaker, is_failure
 
 logger = setup_logger("manager.router")
 
 
+def _hop_options(target: str) -> dict:
+    """Per-call headers/timeout carrying the request deadline to the next hop.
+
+    The read timeout is cut to the remaining budget plus a grace period so the
+    callee can still answer with its own fallback; without a deadline the
+    client's configured timeouts apply.
+    """
+    left = remaining()
+    if left is None:
+        return {}
+    settings = get_settings()
+    if target == WORKER:
+        connect, read = settings.WORKER_CONNECT_TIMEOUT, settings.WORKER_READ_TIMEOUT
+    else:
+        connect, read = settings.EVALUATOR_CONNECT_TIMEOUT, settings.EVALUATOR_READ_TIMEOUT
+    read = min(read, left + settings.DEADLINE_GRACE_SECONDS)
+    return {
+        "headers": deadline_headers(),
+        "timeout": httpx.Timeout(read, connect=min(connect, read), read=read, pool=min(connect, read)),
+    }
+
+
+@stage("manager", "worker_call")
 async def call_worker(request_id: UUID, task_type: str, refined_input: str) -> TaskOutput:
     settings = get_settings()
     payload = TaskInput(request_id=request_id, task_type=task_type, refined_input=refined_input)
 
+    async def send() -> httpx.Response:
+        async with track_request(WORKER), use_endpoint(WORKER) as endpoint:
+            resp = await get_client(WORKER).post(
+                endpoint.url("/api/v1/task"),
+                json=payload.model_dump(mode="json"),
+                **_hop_options(WORKER),
+            )
+            resp.raise_for_status()
+        return resp
+
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            resp = await client.post(
-                f"{settings.WORKER_URL}/api/v1/task",
+        resp = await maybe_hedge(WORKER, lambda: call_with_resilience(WORKER, send))
+        return TaskOutput(**resp.json())
+    except httpx.ConnectError:
+        logger.error("worker_unreachable", extra={"request_id": str(request_id)})
+        raise RuntimeError(f"Worker service unreachable at {settings.WORKER_URL}")
+    except httpx.TimeoutException:
+        logger.error("worker_timeout", extra={"request_id": str(request_id)})
+        raise RuntimeError(f"Worker service timed out at {settings.WORKER_URL}")
+
+
+@stage("manager", "worker_call")
+async def call_worker_fused(request_id: UUID, task_type: str, user_input: str) -> FusedTaskOutput:
+    """Single-call refine+generate on the worker; the result carries the refined input."""
+    settings = get_settings()
+    payload = FusedTaskInput(request_id=request_id, task_type=task_type, user_input=user_input)
+
+    async def send() -> httpx.Response:
+        async with track_request(WORKER), use_endpoint(WORKER) as endpoint:
+            resp = await get_client(WORKER).post(
+                endpoint.url("/api/v1/task/fused"),
                 json=payload.model_dump(mode="json"),
+                **_hop_options(WORKER),
             )
             resp.raise_for_status()
-            return TaskOutput(**resp.json())
+        return resp
+
+    try:
+        resp = await maybe_hedge(WORKER, lambda: call_with_resilience(WORKER, send))
+        return FusedTaskOutput(**resp.json())
     except httpx.ConnectError:
         logger.error("worker_unreachable", extra={"request_id": str(request_id)})
         raise RuntimeError(f"Worker service unreachable at {settings.WORKER_URL}")
@@ -29,6 +94,58 @@ async def call_worker(request_id: UUID, task_type: str, refined_input: str) -> T
         raise RuntimeError(f"Worker service timed out at {settings.WORKER_URL}")
 
 
+async def stream_worker(request_id: UUID, task_type: str, refined_input: str) -> AsyncIterator[dict]:
+    """Relay the worker's NDJSON stream as dict events (``delta`` ..., then ``done``)."""
+    settings = get_settings()
+    payload = TaskInput(request_id=request_id, task_type=task_type, refined_input=refined_input)
+
+    # Breaker only: tokens already relayed to the client can't be retried
+    breaker = get_breaker(WORKER)
+    breaker.allow()
+    ok = None
+    try:
+        async with track_request(WORKER), use_endpoint(WORKER) as endpoint:
+            async with get_client(WORKER).stream(
+                "POST",
+                endpoint.url("/api/v1/task/stream"),
+                json=payload.model_dump(mode="json"),
+                **_hop_options(WORKER),
+            ) as resp:
+                if resp.is_error:
+                    await resp.aread()
+                resp.raise_for_status()
+                async for line in resp.aiter_lines():
+                    if not line:
+                        continue
+                    event = json.loads(line)
+                    if event.get("type") == "error":
+                        raise RuntimeError(event.get("detail", "Worker stream failed"))
+                    yield event
+        ok = True
+    except httpx.ConnectError:
+        ok = False
+        logger.error("worker_unreachable", extra={"request_id": str(request_id)})
+        raise RuntimeError(f"Worker service unreachable at {settings.WORKER_URL}")
+    except httpx.TimeoutException as e:
+        # A timeout from the spent request budget leaves ok None: no verdict on the worker
+        ok = None if is_deadline_error(e) else False
+        logger.error("worker_timeout", extra={"request_id": str(request_id)})
+        raise RuntimeError(f"Worker service timed out at {settings.WORKER_URL}")
+    except httpx.HTTPStatusError as e:
+        ok = None if is_deadline_error(e) else not is_failure(e)
+        raise
+    except Exception:
+        ok = False
+        raise
+    finally:
+        if ok is None:
+            # Cancelled, client gone mid-stream or budget spent: no verdict on the worker
+            breaker.release()
+        else:
+            breaker.record(ok)
+
+
+@stage("manager", "evaluator_call")
 async def call_evaluator(
     request_id: UUID, task_type: str,
     user_input: str, refined_input: str, worker_output: str,
@@ -42,14 +159,19 @@ async def call_evaluator(
         worker_output=worker_output,
     )
 
-    try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            resp = await client.post(
-                f"{settings.EVALUATOR_URL}/api/v1/evaluate",
+    async def send() -> httpx.Response:
+        async with track_request(EVALUATOR), use_endpoint(EVALUATOR) as endpoint:
+            resp = await get_client(EVALUATOR).post(
+                endpoint.url("/api/v1/evaluate"),
                 json=payload.model_dump(mode="json"),
+                **_hop_options(EVALUATOR),
             )
             resp.raise_for_status()
-            return EvaluateOutput(**resp.json())
+        return resp
+
+    try:
+        resp = await call_with_resilience(EVALUATOR, send)
+        return EvaluateOutput(**resp.json())
     except httpx.ConnectError:
         logger.error("evaluator_unreachable", extra={"request_id": str(request_id)})
         raise RuntimeError(f"Evaluator service unreachable at {settings.EVALUATOR_URL}")
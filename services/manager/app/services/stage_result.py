@@ -0,0 +1,42 @@
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from services.common.schemas import EvaluateOutput, TokenUsage
+
+
+@dataclass
+class StageResult:
+    """Outputs of refine -> worker -> evaluate, independent of the caller's request_id."""
+    refined_input: str
+    prompt_version: int
+    worker_output: str
+    worker_latency_ms: int
+    # None while a deferred evaluation is pending
+    evaluation: Optional[EvaluateOutput]
+    # Refinement decision/latency recorded into evaluation_detail
+    refine_detail: Optional[dict] = None
+    # Set when served from the result cache ("memory" or "db") instead of computed
+    cache_source: Optional[str] = None
+    # Stage timings as seen by the manager; None for stages that didn't run here
+    refine_latency_ms: Optional[int] = None
+    worker_roundtrip_ms: Optional[int] = None
+    evaluator_roundtrip_ms: Optional[int] = None
+    # Billed LLM usage per stage; None for stages that didn't run for this request
+    refine_usage: Optional[TokenUsage] = None
+    worker_usage: Optional[TokenUsage] = None
+    evaluator_usage: Optional[TokenUsage] = None
+
+    def total_usage(self) -> TokenUsage:
+        total = TokenUsage()
+        for usage in (self.refine_usage, self.worker_usage, self.evaluator_usage):
+            if usage is not None:
+                total.input_tokens += usage.input_tokens
+                total.output_tokens += usage.output_tokens
+                total.cost_usd += usage.cost_usd
+        return total
+
+
+def elapsed_ms(start: float) -> int:
+    """Milliseconds since a time.perf_counter() reading."""
+    return int((time.perf_counter() - start) * 1000)
@@ -4,7 +4,8 @@ import re
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
-from services.common.llm_provider import get_llm
+from services.common.instrumentation import stage
+from services.common.llm_provider import get_llm, get_chain
 from services.common.logging_utils import setup_logger
 
 logger = setup_logger("optimizer.agent")
@@ -36,7 +37,7 @@ Write an IMPROVED version of the system prompt that addresses the identified iss
 Output ONLY the new system prompt text, nothing else. Do not wrap it in quotes or markdown."""
 
 
-def build_analyzer_chain():
+def _compile_analyzer_chain():
     llm = get_llm(temperature=0.2)
     prompt = ChatPromptTemplate.from_messages([
         ("system", ANALYZER_PROMPT),
@@ -45,7 +46,7 @@ def build_analyzer_chain():
     return prompt | llm | StrOutputParser()
 
 
-def build_patcher_chain():
+def _compile_patcher_chain():
     llm = get_llm(temperature=0.3)
     prompt = ChatPromptTemplate.from_messages([
         ("system", "You are a prompt engineering expert."),
@@ -54,6 +55,15 @@ def build_patcher_chain():
     return prompt | llm | StrOutputParser()
 
 
+def build_analyzer_chain():
+    return get_chain("optimizer_analyzer", ANALYZER_PROMPT, _compile_analyzer_chain)
+
+
+def build_patcher_chain():
+    return get_chain("optimizer_patcher", PATCHER_PROMPT, _compile_patcher_chain)
+
+
+@stage("optimizer", "analyze_llm")
 async def analyze_failures(current_prompt: str, failure_logs: list[dict]) -> dict:
     """Analyze failure patterns using LLM."""
     chain = build_analyzer_chain()
@@ -78,6 +88,7 @@ async def analyze_failures(current_prompt: str, failure_logs: list[dict]) -> dic
         }
 
 
+@stage("optimizer", "patch_llm")
 async def generate_improved_prompt(current_prompt: str, failure_analysis: dict) -> str:
     """Generate an improved system prompt based on failure analysis."""
     chain = build_patcher_chain()
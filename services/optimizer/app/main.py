@@ -9,6 +9,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", ".."))
 from services.common.db import get_session_factory
 from services.common.logging_utils import setup_logger
 from services.common.metrics import OPTIMIZATION_RUNS
+from services.common.tracing import get_exporter, span
 from services.optimizer.app.services.log_analyzer import get_task_types_needing_optimization
 from services.optimizer.app.services.prompt_patcher import patch_prompt
 from services.optimizer.app.services.reporter import save_report, format_report
@@ -61,5 +62,15 @@ async def run_optimization_cycle():
     logger.info("optimization_cycle_completed")
 
 
+async def main():
+    exporter = get_exporter()
+    exporter.start()
+    try:
+        with span("optimization_cycle", service="optimizer"):
+            await run_optimization_cycle()
+    finally:
+        await exporter.stop()
+
+
 if __name__ == "__main__":
-    asyncio.run(run_optimization_cycle())
+    asyncio.run(main())
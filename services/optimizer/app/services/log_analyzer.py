@@ -74,3 +74,29 @@ async def get_task_types_needing_optimization(db: AsyncSession) -> list[str]:
         "threshold": settings.OPTIMIZER_FAILURE_THRESHOLD,
     })
     return task_types
+
+
+async def get_worker_token_averages(
+    db: AsyncSession, task_type: str, prompt_version: int,
+) -> tuple[float | None, float | None]:
+    """Average billed worker (input, output) tokens per request for a prompt version in the lookback window."""
+    settings = get_settings()
+    cutoff = datetime.now(timezone.utc) - timedelta(minutes=settings.OPTIMIZER_LOOKBACK_MINUTES)
+
+    stmt = select(
+        func.avg(ExecutionLog.worker_input_tokens),
+        func.avg(ExecutionLog.worker_output_tokens),
+    ).where(
+        and_(
+            ExecutionLog.task_type == task_type,
+            ExecutionLog.prompt_version == prompt_version,
+            ExecutionLog.worker_input_tokens.isnot(None),
+            ExecutionLog.created_at >= cutoff,
+        )
+    )
+    result = await db.execute(stmt)
+    avg_input, avg_output = result.one()
+    return (
+        float(avg_input) if avg_input is not None else None,
+        float(avg_output) if avg_output is not None else None,
+    )
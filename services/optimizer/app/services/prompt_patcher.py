@@ -1,11 +1,14 @@
-from sqlalchemy import select, update
+from sqlalchemy import select, update, text
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from services.common.config import get_settings
+from services.common.instrumentation import track_usage
+from services.common.llm_provider import estimate_tokens
 from services.common.logging_utils import setup_logger
 from services.common.models import Prompt
-from services.common.metrics import OPTIMIZATION_RUNS, PROMPT_VERSION
+from services.common.metrics import OPTIMIZATION_RUNS, PROMPT_VERSION, PROMPT_TOKENS
 from services.optimizer.app.agents.optimizer_agent import analyze_failures, generate_improved_prompt
-from services.optimizer.app.services.log_analyzer import get_failure_logs
+from services.optimizer.app.services.log_analyzer import get_failure_logs, get_worker_token_averages
 
 logger = setup_logger("optimizer.prompt_patcher")
 
@@ -53,10 +56,14 @@ async def patch_prompt(db: AsyncSession, task_type: str) -> dict | None:
         "failure_count": len(failures),
         "current_version": current.version,
     })
-    analysis = await analyze_failures(current.content, failure_summaries)
+    with track_usage(task_type, current.version) as optimizer_usage:
+        analysis = await analyze_failures(current.content, failure_summaries)
 
-    # Step 2: Generate improved prompt
-    improved_content = await generate_improved_prompt(current.content, analysis)
+        # Step 2: Generate improved prompt
+        improved_content = await generate_improved_prompt(current.content, analysis)
+    before_tokens = estimate_tokens(current.content)
+    after_tokens = estimate_tokens(improved_content)
+    avg_worker_input, avg_worker_output = await get_worker_token_averages(db, task_type, current.version)
 
     # Step 3 & 4: Deactivate current + insert new in a single transaction
     new_version = current.version + 1
@@ -77,6 +84,12 @@ async def patch_prompt(db: AsyncSession, task_type: str) -> dict | None:
             created_by="optimizer",
         )
         db.add(new_prompt)
+
+        # Delivered to worker prompt caches only once the transaction commits
+        await db.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": get_settings().PROMPT_NOTIFY_CHANNEL, "payload": task_type},
+        )
         await db.commit()
     except Exception as e:
         await db.rollback()
@@ -89,11 +102,14 @@ async def patch_prompt(db: AsyncSession, task_type: str) -> dict | None:
     # Update metrics
     OPTIMIZATION_RUNS.labels(task_type=task_type, result="success").inc()
     PROMPT_VERSION.labels(task_type=task_type).set(new_version)
+    PROMPT_TOKENS.labels(task_type=task_type).set(after_tokens)
 
     logger.info("prompt_patched", extra={
         "task_type": task_type,
         "before_version": current.version,
         "after_version": new_version,
+        "before_prompt_tokens": before_tokens,
+        "after_prompt_tokens": after_tokens,
     })
 
     return {
@@ -104,4 +120,10 @@ async def patch_prompt(db: AsyncSession, task_type: str) -> dict | None:
         "after_content": improved_content,
         "failure_analysis": analysis,
         "failure_count": len(failures),
+        "before_prompt_tokens": before_tokens,
+        "after_prompt_tokens": after_tokens,
+        # Observed for the before version; the after version has no traffic yet
+        "before_avg_worker_input_tokens": avg_worker_input,
+        "before_avg_worker_output_tokens": avg_worker_output,
+        "optimizer_usage": optimizer_usage.model_dump(),
     }
@@ -15,6 +15,8 @@ async def save_report(db: AsyncSession, optimization_info: dict) -> Optimization
         after_prompt_version=optimization_info["after_version"],
         after_prompt_content=optimization_info["after_content"],
         failure_analysis=optimization_info["failure_analysis"],
+        before_prompt_tokens=optimization_info.get("before_prompt_tokens"),
+        after_prompt_tokens=optimization_info.get("after_prompt_tokens"),
         triggered_by="optimizer",
     )
     db.add(report)
@@ -27,9 +29,23 @@ async def save_report(db: AsyncSession, optimization_info: dict) -> Optimization
     return report
 
 
+def format_token_delta(before: int | None, after: int | None) -> str:
+    """e.g. "120 -> 180 (+60, +50.0%)"; prompt sizes are local estimates."""
+    if before is None or after is None:
+        return "n/a"
+    delta = after - before
+    pct = f", {delta / before * 100:+.1f}%" if before else ""
+    return f"{before} -> {after} ({delta:+d}{pct})"
+
+
+def _format_average(value: float | None) -> str:
+    return f"{value:.0f}" if value is not None else "n/a"
+
+
 def format_report(optimization_info: dict) -> str:
     """Format a human-readable optimization report."""
     analysis = optimization_info.get("failure_analysis", {})
+    usage = optimization_info.get("optimizer_usage", {})
     return f"""
 === Self-Healing Optimization Report ===
 Task Type: {optimization_info['task_type']}
@@ -47,5 +63,10 @@ Root Causes: {', '.join(analysis.get('root_causes', []))}
 
 --- Improvements Applied ---
 {chr(10).join('- ' + s for s in analysis.get('improvement_suggestions', []))}
+
+--- Token Usage ---
+Prompt Tokens (est.): {format_token_delta(optimization_info.get('before_prompt_tokens'), optimization_info.get('after_prompt_tokens'))}
+Avg Worker Tokens v{optimization_info['before_version']} (in/out): {_format_average(optimization_info.get('before_avg_worker_input_tokens'))} / {_format_average(optimization_info.get('before_avg_worker_output_tokens'))}
+Optimizer LLM Cost: {usage.get('input_tokens', 0)} in / {usage.get('output_tokens', 0)} out tokens, ${usage.get('cost_usd', 0.0):.6f}
 ========================================
 """
@@ -1,14 +1,74 @@
+import json
+import re
+
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
-from services.common.llm_provider import get_llm
+from services.common.llm_provider import get_llm, get_chain
+from services.common.logging_utils import setup_logger
+from services.common.prompts import REFINE_SYSTEM_PROMPT
 
+logger = setup_logger("worker.agent")
 
-def build_worker_chain(system_prompt: str):
-    """Build a LangChain chain with dynamically loaded system prompt."""
-    llm = get_llm(temperature=0.3)
+
+def _compile_worker_chain(system_prompt: str):
+    # Uncached: a failing output must be regenerated on retry, not replayed to the judge
+    llm = get_llm(temperature=0.3, cache=False)
     prompt = ChatPromptTemplate.from_messages([
         ("system", system_prompt),
         ("human", "{refined_input}"),
     ])
     return prompt | llm | StrOutputParser()
+
+
+def build_worker_chain(system_prompt: str):
+    """Return the chain for a dynamically loaded system prompt, compiled once per prompt."""
+    return get_chain("worker", system_prompt, lambda: _compile_worker_chain(system_prompt))
+
+
+def _escape(text: str) -> str:
+    # Embedded prompts are literal text, not template variables
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+def build_fused_system_prompt(system_prompt: str) -> str:
+    """Combine the refiner prompt and the active worker prompt into one refine+generate prompt."""
+    return (
+        "Complete two steps in a single answer.\n\n"
+        "Step 1 - refine the user's request. For this step only, follow these instructions:\n"
+        f"{_escape(REFINE_SYSTEM_PROMPT)}\n\n"
+        "Step 2 - fulfil the refined request from step 1, following these instructions:\n"
+        f"{_escape(system_prompt)}\n\n"
+        "Respond in EXACTLY this JSON format (no extra text):\n"
+        '{{"refined_request": "<step 1 output>", "code": "<step 2 output>"}}'
+    )
+
+
+def _compile_fused_chain(fused_prompt: str):
+    # Uncached, like the single-stage worker chain
+    llm = get_llm(temperature=0.3, cache=False)
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", fused_prompt),
+        ("human", "Task type: {task_type}\nUser request: {user_input}"),
+    ])
+    return prompt | llm | StrOutputParser()
+
+
+def build_fused_chain(system_prompt: str):
+    """Single-call refine+generate chain for the active worker prompt."""
+    fused_prompt = build_fused_system_prompt(system_prompt)
+    return get_chain("worker_fused", fused_prompt, lambda: _compile_fused_chain(fused_prompt))
+
+
+def parse_fused_output(raw: str, user_input: str) -> tuple[str, str]:
+    """Split a fused response into (refined_request, code).
+
+    Falls back to (user_input, raw) when the model did not return the JSON shape.
+    """
+    try:
+        json_match = re.search(r"\{.*\}", raw, re.DOTALL)
+        parsed = json.loads(json_match.group() if json_match else raw)
+        return str(parsed["refined_request"]), str(parsed["code"])
+    except (json.JSONDecodeError, KeyError, TypeError) as e:
+        logger.warning("fused_output_parse_failed", extra={"error": str(e), "raw": raw[:200]})
+        return user_input, raw
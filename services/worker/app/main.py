@@ -1,18 +1,31 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from prometheus_client import make_asgi_app
 
+from services.common.deadline import DeadlineMiddleware
+from services.common.tracing import TracingMiddleware, get_exporter
 from services.worker.app.routes.health import router as health_router
 from services.worker.app.routes.task import router as task_router
+from services.worker.app.services.prompt_cache import listen_for_prompt_changes
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    get_exporter().start()
+    stop = asyncio.Event()
+    listener = asyncio.create_task(listen_for_prompt_changes(stop))
     yield
+    stop.set()
+    await listener
+    await get_exporter().stop()
 
 
 app = FastAPI(title="Worker Service", version="1.0.0", lifespan=lifespan)
+# Deadline comes from the caller's header only
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(TracingMiddleware, service="worker")
 
 metrics_app = make_asgi_app()
 app.mount("/metrics", metrics_app)
@@ -1,29 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.ext.asyncio import AsyncSession
+import json
 
-from services.common.db import get_db
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from services.common.deadline import DeadlineExceeded
 from services.common.logging_utils import setup_logger
-from services.common.schemas import TaskInput, TaskOutput
-from services.worker.app.services.executor import execute_task
+from services.common.schemas import TaskInput, TaskOutput, FusedTaskInput, FusedTaskOutput
+from services.common.tracing import set_request_id
+from services.worker.app.services.executor import execute_task, execute_fused_task, stream_task
 
 logger = setup_logger("worker.task")
 router = APIRouter()
 
 
 @router.post("/task", response_model=TaskOutput)
-async def handle_task(
-    body: TaskInput,
-    db: AsyncSession = Depends(get_db),
-):
+async def handle_task(body: TaskInput):
+    set_request_id(body.request_id)
     logger.info("task_received", extra={
         "request_id": str(body.request_id),
         "task_type": body.task_type,
     })
 
     try:
-        output, prompt_version, latency_ms = await execute_task(
-            db, body.task_type, body.refined_input,
+        output, prompt_version, latency_ms, usage = await execute_task(
+            body.task_type, body.refined_input,
         )
+    except DeadlineExceeded as e:
+        logger.warning("task_deadline_exceeded", extra={"request_id": str(body.request_id)})
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error("task_execution_failed", extra={
             "request_id": str(body.request_id),
@@ -37,4 +41,77 @@ async def handle_task(
         output=output,
         prompt_version=prompt_version,
         latency_ms=latency_ms,
+        usage=usage,
+    )
+
+
+@router.post("/task/fused", response_model=FusedTaskOutput)
+async def handle_fused_task(body: FusedTaskInput):
+    """Refine the raw user input and generate the output in a single LLM call."""
+    set_request_id(body.request_id)
+    logger.info("fused_task_received", extra={
+        "request_id": str(body.request_id),
+        "task_type": body.task_type,
+    })
+
+    try:
+        refined_input, output, prompt_version, latency_ms, usage = await execute_fused_task(
+            body.task_type, body.user_input,
+        )
+    except DeadlineExceeded as e:
+        logger.warning("task_deadline_exceeded", extra={"request_id": str(body.request_id)})
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        logger.error("task_execution_failed", extra={
+            "request_id": str(body.request_id),
+            "task_type": body.task_type,
+            "error": str(e),
+        })
+        raise HTTPException(status_code=500, detail=f"Task execution failed: {str(e)}")
+
+    return FusedTaskOutput(
+        request_id=body.request_id,
+        refined_input=refined_input,
+        output=output,
+        prompt_version=prompt_version,
+        latency_ms=latency_ms,
+        usage=usage,
     )
+
+
+@router.post("/task/stream")
+async def handle_task_stream(body: TaskInput):
+    """Stream worker output as NDJSON: ``delta`` events, then ``done`` (or ``error``)."""
+    set_request_id(body.request_id)
+    logger.info("task_stream_received", extra={
+        "request_id": str(body.request_id),
+        "task_type": body.task_type,
+    })
+
+    try:
+        _, events = await stream_task(body.task_type, body.refined_input)
+    except Exception as e:
+        logger.error("task_execution_failed", extra={
+            "request_id": str(body.request_id),
+            "task_type": body.task_type,
+            "error": str(e),
+        })
+        raise HTTPException(status_code=500, detail=f"Task execution failed: {str(e)}")
+
+    async def ndjson():
+        try:
+            async for event in events:
+                yield json.dumps(event) + "\n"
+        except DeadlineExceeded as e:
+            logger.warning("task_deadline_exceeded", extra={"request_id": str(body.request_id)})
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+        except Exception as e:
+            # Headers are already sent, so failures mid-stream are reported in-band
+            logger.error("task_stream_failed", extra={
+                "request_id": str(body.request_id),
+                "task_type": body.task_type,
+                "error": str(e),
+            })
+            yield json.dumps({"type": "error", "detail": f"Task execution failed: {str(e)}"}) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
@@ -1,35 +1,106 @@
 import time
+from typing import AsyncIterator
 
-from sqlalchemy.ext.asyncio import AsyncSession
-
+from services.common.deadline import iter_with_deadline, with_deadline
+from services.common.instrumentation import stage, track_usage
 from services.common.logging_utils import setup_logger
 from services.common.metrics import REQUEST_COUNT, REQUEST_LATENCY
-from services.worker.app.agents.worker_agent import build_worker_chain
+from services.common.schemas import TokenUsage
+from services.common.tracing import exemplar
+from services.worker.app.agents.worker_agent import build_worker_chain, build_fused_chain, parse_fused_output
 from services.worker.app.services.prompt_loader import load_active_prompt
 
 logger = setup_logger("worker.executor")
 
 
-async def execute_task(db: AsyncSession, task_type: str, refined_input: str) -> tuple[str, int, int]:
-    """Execute a task with the current active prompt. Returns (output, prompt_version, latency_ms)."""
+async def execute_task(task_type: str, refined_input: str) -> tuple[str, int, int, TokenUsage]:
+    """Execute a task with the current active prompt. Returns (output, prompt_version, latency_ms, usage)."""
     # Load the latest active prompt from DB (core self-healing mechanism)
-    system_prompt, prompt_version = await load_active_prompt(db, task_type)
+    system_prompt, prompt_version = await load_active_prompt(task_type)
 
     # Build chain with dynamic prompt and execute
     chain = build_worker_chain(system_prompt)
 
     start = time.time()
-    output = await chain.ainvoke({"refined_input": refined_input})
+    with stage("worker", "llm"), track_usage(task_type, prompt_version) as usage:
+        output = await with_deadline(chain.ainvoke({"refined_input": refined_input}))
     latency_ms = int((time.time() - start) * 1000)
 
     REQUEST_COUNT.labels(service="worker", task_type=task_type, status="success").inc()
-    REQUEST_LATENCY.labels(service="worker", endpoint="/api/v1/task").observe(latency_ms / 1000)
+    REQUEST_LATENCY.labels(service="worker", endpoint="/api/v1/task").observe(latency_ms / 1000, exemplar=exemplar())
 
     logger.info("task_executed", extra={
         "task_type": task_type,
         "prompt_version": prompt_version,
         "latency_ms": latency_ms,
         "output_length": len(output),
+        "input_tokens": usage.input_tokens,
+        "output_tokens": usage.output_tokens,
     })
 
-    return output, prompt_version, latency_ms
+    return output, prompt_version, latency_ms, usage
+
+
+async def execute_fused_task(task_type: str, user_input: str) -> tuple[str, str, int, int, TokenUsage]:
+    """Refine and generate in one LLM call. Returns (refined_input, output, prompt_version, latency_ms, usage)."""
+    system_prompt, prompt_version = await load_active_prompt(task_type)
+    chain = build_fused_chain(system_prompt)
+
+    start = time.time()
+    with stage("worker", "llm_fused"), track_usage(task_type, prompt_version) as usage:
+        raw = await with_deadline(chain.ainvoke({"user_input": user_input, "task_type": task_type}))
+    refined_input, output = parse_fused_output(raw, user_input)
+    latency_ms = int((time.time() - start) * 1000)
+
+    REQUEST_COUNT.labels(service="worker", task_type=task_type, status="success").inc()
+    REQUEST_LATENCY.labels(service="worker", endpoint="/api/v1/task/fused").observe(latency_ms / 1000, exemplar=exemplar())
+
+    logger.info("fused_task_executed", extra={
+        "task_type": task_type,
+        "prompt_version": prompt_version,
+        "latency_ms": latency_ms,
+        "output_length": len(output),
+        "input_tokens": usage.input_tokens,
+        "output_tokens": usage.output_tokens,
+    })
+
+    return refined_input, output, prompt_version, latency_ms, usage
+
+
+async def stream_task(task_type: str, refined_input: str) -> tuple[int, AsyncIterator[dict]]:
+    """Streaming variant of execute_task. Returns (prompt_version, event iterator).
+
+    The prompt is loaded eagerly so a missing prompt fails before the response
+    starts; the iterator yields ``delta`` events per chunk, then one ``done``
+    carrying the token usage.
+    """
+    system_prompt, prompt_version = await load_active_prompt(task_type)
+    chain = build_worker_chain(system_prompt)
+
+    async def events() -> AsyncIterator[dict]:
+        start = time.time()
+        output_length = 0
+        with stage("worker", "llm_stream"), track_usage(task_type, prompt_version) as usage:
+            async for chunk in iter_with_deadline(chain.astream({"refined_input": refined_input})):
+                if not chunk:
+                    continue
+                output_length += len(chunk)
+                yield {"type": "delta", "text": chunk}
+        latency_ms = int((time.time() - start) * 1000)
+
+        REQUEST_COUNT.labels(service="worker", task_type=task_type, status="success").inc()
+        REQUEST_LATENCY.labels(service="worker", endpoint="/api/v1/task/stream").observe(latency_ms / 1000, exemplar=exemplar())
+
+        logger.info("task_streamed", extra={
+            "task_type": task_type,
+            "prompt_version": prompt_version,
+            "latency_ms": latency_ms,
+            "output_length": output_length,
+            "input_tokens": usage.input_tokens,
+            "output_tokens": usage.output_tokens,
+        })
+        yield {
+            "type": "done", "prompt_version": prompt_version, "latency_ms": latency_ms, "usage": usage.model_dump(),
+        }
+
+    return prompt_version, events()
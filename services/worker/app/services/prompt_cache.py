@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+from services.common.config import get_settings
+from services.common.logging_utils import setup_logger
+from services.common.metrics import (
+    PROMPT_CACHE_REQUESTS, PROMPT_CACHE_STALENESS, PROMPT_CACHE_INVALIDATIONS,
+)
+from services.common.prompt_notify import listen_prompt_channel
+
+logger = setup_logger("worker.prompt_cache")
+
+
+class PromptCache:
+    """In-process cache of active prompts keyed by task_type, with a TTL safety net."""
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._entries: dict[str, tuple[str, int, float]] = {}
+        # Bumped on every invalidation so a DB load that raced a NOTIFY is not cached
+        self.generation = 0
+
+    def get(self, task_type: str) -> tuple[str, int] | None:
+        entry = self._entries.get(task_type)
+        if entry is not None:
+            content, version, loaded_at = entry
+            age = time.monotonic() - loaded_at
+            if age < self.ttl_seconds:
+                PROMPT_CACHE_REQUESTS.labels(task_type=task_type, result="hit").inc()
+                PROMPT_CACHE_STALENESS.labels(task_type=task_type).observe(age)
+                return content, version
+            self._entries.pop(task_type, None)
+            PROMPT_CACHE_INVALIDATIONS.labels(reason="ttl").inc()
+        PROMPT_CACHE_REQUESTS.labels(task_type=task_type, result="miss").inc()
+        return None
+
+    def set(self, task_type: str, content: str, version: int, generation: int) -> None:
+        if generation == self.generation:
+            self._entries[task_type] = (content, version, time.monotonic())
+
+    def invalidate(self, task_type: str | None = None, reason: str = "notify") -> None:
+        """Drop one task_type, or everything when task_type is None."""
+        if task_type is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(task_type, None)
+        self.generation += 1
+        PROMPT_CACHE_INVALIDATIONS.labels(reason=reason).inc()
+        logger.info("prompt_cache_invalidated", extra={"task_type": task_type, "reason": reason})
+
+
+_cache: PromptCache | None = None
+
+
+def get_prompt_cache() -> PromptCache:
+    global _cache
+    if _cache is None:
+        _cache = PromptCache(get_settings().PROMPT_CACHE_TTL_SECONDS)
+    return _cache
+
+
+async def listen_for_prompt_changes(stop: asyncio.Event) -> None:
+    """Invalidate the worker prompt cache on every prompt NOTIFY until stopped."""
+    cache = get_prompt_cache()
+
+    def on_change(task_type: str | None, reason: str) -> None:
+        cache.invalidate(task_type, reason=reason)
+
+    await listen_prompt_channel(stop, on_change)
@@ -1,28 +1,40 @@
 from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
 
+from services.common.db import db_session
+from services.common.instrumentation import stage
 from services.common.logging_utils import setup_logger
 from services.common.models import Prompt
 from services.common.metrics import PROMPT_VERSION
+from services.worker.app.services.prompt_cache import get_prompt_cache
 
 logger = setup_logger("worker.prompt_loader")
 
 
-async def load_active_prompt(db: AsyncSession, task_type: str) -> tuple[str, int]:
-    """Load the current active prompt from DB. Returns (content, version)."""
+@stage("worker", "prompt_load")
+async def load_active_prompt(task_type: str) -> tuple[str, int]:
+    """Load the current active prompt, from cache or DB. Returns (content, version)."""
+    cache = get_prompt_cache()
+    cached = cache.get(task_type)
+    if cached is not None:
+        return cached
+    generation = cache.generation
+
     stmt = (
         select(Prompt)
         .where(Prompt.task_type == task_type, Prompt.is_active == True)
         .order_by(Prompt.version.desc())
         .limit(1)
     )
-    result = await db.execute(stmt)
-    prompt = result.scalar_one_or_none()
+    # Session scoped to the query only; the connection is back in the pool before any LLM call
+    async with db_session() as db:
+        result = await db.execute(stmt)
+        prompt = result.scalar_one_or_none()
 
     if prompt is None:
         logger.warning("no_active_prompt", extra={"task_type": task_type})
         raise ValueError(f"No active prompt found for task_type={task_type}")
 
+    cache.set(task_type, prompt.content, prompt.version, generation)
     PROMPT_VERSION.labels(task_type=task_type).set(prompt.version)
     logger.info("prompt_loaded", extra={
         "task_type": task_type,